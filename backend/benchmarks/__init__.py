@@ -0,0 +1,12 @@
+"""
+Бенчмарки бэкенда, запускаются из папки backend/:
+
+    python -m benchmarks.<имя модуля>
+"""
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
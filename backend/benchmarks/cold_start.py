@@ -0,0 +1,279 @@
+"""
+Бенчмарк холодного старта воркера: время импорта app.py, create_app,
+прогрева warm_up и время до первого ответа. Каждый прогон это новый
+процесс интерпретатора. Запуск из backend/:
+
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 20 --save-baseline sqlite
+    python -m benchmarks.cold_start --baseline sqlite
+    python -m benchmarks.cold_start --importtime
+
+По умолчанию база это временный файл SQLite, --database-uri задает другую
+(таблицы пересоздаются). first_response - время от начала импорта до
+первого ответа, как у воркера без preload. С preload импорт и прогрев
+делает мастер, а воркер платит только first_request. Повторный запрос
+(repeat_request) показывает сколько из first_request это разовая
+подготовка. С --baseline сравнивает медианы с сохраненными в
+benchmarks/baselines/ и завершается с кодом 1, если замер вырос больше
+чем на --tolerance или при старте загружаются модули только для
+документации
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import benchmarks  # noqa: F401  добавляет src/ в sys.path
+from benchmarks.datagen import SCALES, seed
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+PATHS = ("/api/games", "/api/lobbies?open_slots=true", "/api/bids",
+         "/api/users/profile")
+# Нужны только для /api/docs, при старте воркера загружаться не должны
+DOCS_MODULES = ("flasgger", "openapi_pydantic")
+PHASES = ("import_ms", "create_app_ms", "warm_up_ms", "first_request_ms",
+          "repeat_request_ms", "first_response_ms")
+
+
+def _ms(start, end):
+    return round((end - start) * 1000, 3)
+
+
+def measure(paths, token, warm):
+    """
+    Один холодный старт в текущем процессе, вызывается в дочернем
+    процессе до любого импорта приложения
+    """
+    start = time.perf_counter()
+    from app import create_app, warm_up
+    imported = time.perf_counter()
+
+    app = create_app()
+    created = time.perf_counter()
+    if warm:
+        warm_up(app)
+    warmed = time.perf_counter()
+    docs_modules = sorted(name for name in DOCS_MODULES if name in sys.modules)
+
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    first, repeat, statuses = {}, {}, {}
+    first_response = None
+    for path in paths:
+        request_start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        response.get_data()
+        request_end = time.perf_counter()
+        if first_response is None:
+            first_response = _ms(start, request_end)
+        first[path] = _ms(request_start, request_end)
+        statuses[path] = response.status_code
+
+        request_start = time.perf_counter()
+        client.get(path, headers=headers).get_data()
+        repeat[path] = _ms(request_start, time.perf_counter())
+
+    return {
+        "import_ms": _ms(start, imported),
+        "create_app_ms": _ms(imported, created),
+        "warm_up_ms": _ms(created, warmed),
+        "first_request_ms": first[paths[0]],
+        "repeat_request_ms": repeat[paths[0]],
+        "first_response_ms": first_response,
+        "first": first,
+        "repeat": repeat,
+        "statuses": statuses,
+        "docs_modules": docs_modules,
+    }
+
+
+def prepare_database(database_uri, scale, seed_value):
+    """
+    Пересоздает таблицы, заполняет базу и возвращает токен пользователя
+    для эндпоинтов с авторизацией
+    """
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        dataset = seed(db, SCALES[scale], seed_value)
+        return create_access_token(identity=str(dataset.user_ids[0]),
+                                   expires_delta=False)
+
+
+def run_child(args, env, token):
+    command = [sys.executable, "-m", "benchmarks.cold_start", "--child",
+               "--token", token, "--paths", *args.paths]
+    if args.no_warm_up:
+        command.append("--no-warm-up")
+    output = subprocess.run(command, cwd=BACKEND_DIR, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(env, top):
+    """
+    Самые долгие модули по накопленному времени импорта (python -X importtime)
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR / "src", env=env, check=True,
+        capture_output=True, text=True,
+    ).stderr
+    pattern = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+    modules = []
+    for line in stderr.splitlines():
+        match = pattern.match(line)
+        if match:
+            modules.append((int(match.group(2)), match.group(4)))
+    return sorted(modules, reverse=True)[:top]
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return round((ordered[middle - 1] + ordered[middle]) / 2, 3)
+
+
+def summarize(runs):
+    return {
+        "phases": {
+            phase: median([run[phase] for run in runs]) for phase in PHASES
+        },
+        "first": {
+            path: median([run["first"][path] for run in runs])
+            for path in runs[0]["first"]
+        },
+        "repeat": {
+            path: median([run["repeat"][path] for run in runs])
+            for path in runs[0]["repeat"]
+        },
+        "docs_modules": sorted({
+            name for run in runs for name in run["docs_modules"]
+        }),
+    }
+
+
+def compare(summary, baseline, tolerance):
+    regressions = []
+    for phase, value in summary["phases"].items():
+        previous = baseline["phases"].get(phase)
+        if previous and value > previous * (1 + tolerance):
+            regressions.append(f"{phase}: {previous} -> {value} ms")
+    for path, value in summary["first"].items():
+        previous = baseline["first"].get(path)
+        if previous and value > previous * (1 + tolerance):
+            regressions.append(f"first {path}: {previous} -> {value} ms")
+    loaded = set(summary["docs_modules"]) - set(baseline["docs_modules"])
+    if loaded:
+        regressions.append(f"docs modules loaded at startup: {sorted(loaded)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--database-uri", default=os.getenv("DATABASE_URI"))
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--paths", nargs="*", default=list(PATHS),
+                        help="GET запросы после старта, первый дает first_response")
+    parser.add_argument("--no-warm-up", action="store_true",
+                        help="Не вызывать warm_up, для сравнения")
+    parser.add_argument("--importtime", action="store_true",
+                        help="Показать самые долгие импорты app.py")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--baseline", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Допустимый рост медианы, доля от базовой линии")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--token", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.paths, args.token, not args.no_warm_up)))
+        return
+
+    env = dict(os.environ)
+    database_dir = None
+    if not args.database_uri:
+        database_dir = tempfile.TemporaryDirectory()
+        args.database_uri = f"sqlite:///{database_dir.name}/cold_start.db"
+    env["DATABASE_URI"] = os.environ["DATABASE_URI"] = args.database_uri
+    # Бенчмарк шлет одни и те же запросы с одного адреса
+    env["RATE_LIMIT_ENABLED"] = os.environ["RATE_LIMIT_ENABLED"] = "False"
+    env.pop("METRICS_DIR", None)
+
+    if args.importtime:
+        print(f"{'cumulative ms':>13}  module")
+        for cumulative, module in import_profile(env, args.top):
+            print(f"{cumulative / 1000:13.1f}  {module}")
+        return
+
+    token = prepare_database(args.database_uri, args.scale, args.seed)
+    runs = [run_child(args, env, token) for _ in range(args.runs)]
+    if database_dir is not None:
+        database_dir.cleanup()
+
+    summary = summarize(runs)
+    dialect = args.database_uri.split(":", 1)[0].split("+", 1)[0]
+    print(f"{dialect}, {args.runs} cold starts, "
+          f"warm_up {'off' if args.no_warm_up else 'on'}, medians")
+    for phase, value in summary["phases"].items():
+        print(f"{phase:36} {value:9.2f}")
+    print(f"{'path':36} {'first ms':>9} {'repeat ms':>10}  status")
+    for path, value in summary["first"].items():
+        print(f"{path:36} {value:9.2f} {summary['repeat'][path]:10.2f}  "
+              f"{runs[0]['statuses'][path]}")
+    print(f"docs modules loaded at startup: {summary['docs_modules'] or 'none'}")
+
+    failed = any(status >= 400 for status in runs[0]["statuses"].values())
+
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        path = BASELINES_DIR / f"cold-start-{args.save_baseline}.json"
+        path.write_text(json.dumps({
+            "dialect": dialect,
+            "warm_up": not args.no_warm_up,
+            **summary,
+        }, indent=2, sort_keys=True) + "\n")
+        print(f"baseline saved to {path}")
+
+    if args.baseline:
+        baseline = json.loads(
+            (BASELINES_DIR / f"cold-start-{args.baseline}.json").read_text()
+        )
+        if (baseline["dialect"], baseline["warm_up"]) != \
+                (dialect, not args.no_warm_up):
+            print("baseline was recorded with another dialect or warm_up mode")
+            sys.exit(1)
+
+        regressions = compare(summary, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        failed = failed or bool(regressions)
+        if not regressions:
+            print(f"no regressions against {args.baseline}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
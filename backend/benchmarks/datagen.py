@@ -0,0 +1,169 @@
+"""
+Детерминированный генератор данных для бенчмарков: при одинаковых
+масштабе и seed получается одна и та же база, поэтому число запросов и
+размеры ответов между прогонами сравнимы
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import benchmarks  # noqa: F401  добавляет src/ в sys.path
+
+PASSWORD = "bench-password-1!"
+PLATFORMS = ("pc", "playstation", "xbox", "switch")
+WORDS = (
+    "raid", "ranked", "casual", "chill", "tryhard", "duo", "squad", "night",
+    "weekend", "arena", "quest", "coop", "strategy", "shooter", "moba",
+)
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    games: int
+    bids: int
+    lobbies: int
+    # Среднее число участников лобби кроме автора
+    members_per_lobby: int
+
+
+SCALES = {
+    "small": Scale(users=200, games=50, bids=500, lobbies=300,
+                   members_per_lobby=2),
+    "medium": Scale(users=2000, games=500, bids=5000, lobbies=3000,
+                    members_per_lobby=3),
+    "large": Scale(users=20000, games=5000, bids=50000, lobbies=30000,
+                   members_per_lobby=4),
+}
+
+
+@dataclass
+class Dataset:
+    scale: Scale
+    user_ids: list = field(default_factory=list)
+    usernames: list = field(default_factory=list)
+    game_ids: list = field(default_factory=list)
+    bid_ids: list = field(default_factory=list)
+    lobby_ids: list = field(default_factory=list)
+    # Лобби с запасом мест, в которые бенчмарк вступает и выходит
+    open_lobby_ids: list = field(default_factory=list)
+    lobby_authors: dict = field(default_factory=dict)
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(db, scale: Scale, seed_value: int = 42, batch_size: int = 1000) -> Dataset:
+    """
+    Заполняет пустую базу, строки вставляются пачками через executemany.
+    Пароль у всех пользователей PASSWORD, хеш считается один раз
+    """
+    from werkzeug.security import generate_password_hash
+
+    from bids.models import Bid
+    from extensions import password_hasher
+    from games.models import Game
+    from lobbies.models import Lobby, users as lobby_users
+    from users.models import User
+
+    rng = random.Random(seed_value)
+    dataset = Dataset(scale=scale)
+    password_hash = generate_password_hash(PASSWORD, password_hasher.method)
+
+    def insert(table, rows):
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(table.insert(), rows[start:start + batch_size])
+
+    users = [
+        {
+            "id": user_id,
+            "username": f"bench_user_{user_id}",
+            "password": password_hash,
+            "gender": rng.choice(("male", "female")),
+            "bio": _text(rng, rng.randint(5, 40)),
+            "avatar": None,
+            "telegram_contact": f"@bench{user_id}" if rng.random() < 0.5 else None,
+            "discord_contact": None,
+            "steam_contact": None,
+        }
+        for user_id in range(1, scale.users + 1)
+    ]
+    insert(User.__table__, users)
+    dataset.user_ids = [user["id"] for user in users]
+    dataset.usernames = [user["username"] for user in users]
+
+    games = [
+        {
+            "id": game_id,
+            "name": f"{_text(rng, 2).title()} {game_id}",
+            "description": _text(rng, rng.randint(10, 60))[:500],
+            "release_date": date(2000, 1, 1) + timedelta(days=rng.randint(0, 9000)),
+            "url_image": None,
+        }
+        for game_id in range(1, scale.games + 1)
+    ]
+    insert(Game.__table__, games)
+    dataset.game_ids = [game["id"] for game in games]
+
+    bids = [
+        {
+            "id": bid_id,
+            "game_id": rng.choice(dataset.game_ids),
+            "author_id": rng.choice(dataset.user_ids),
+            "description": _text(rng, rng.randint(5, 40))[:500].ljust(20, "."),
+            "details": _text(rng, rng.randint(3, 20))[:500],
+        }
+        for bid_id in range(1, scale.bids + 1)
+    ]
+    insert(Bid.__table__, bids)
+    dataset.bid_ids = [bid["id"] for bid in bids]
+
+    lobbies, memberships = [], []
+    start_time = datetime(2030, 1, 1)
+    for lobby_id in range(1, scale.lobbies + 1):
+        author_id = rng.choice(dataset.user_ids)
+        slots = rng.randint(2, 10)
+        others = rng.sample(
+            dataset.user_ids,
+            min(slots - 1, rng.randint(0, scale.members_per_lobby * 2),
+                len(dataset.user_ids)),
+        )
+        members = [author_id] + [user_id for user_id in others
+                                 if user_id != author_id]
+        # Каждое десятое лобби просторное и почти пустое, для join/leave
+        if lobby_id % 10 == 0:
+            slots, members = 20, [author_id]
+            dataset.open_lobby_ids.append(lobby_id)
+
+        lobbies.append({
+            "id": lobby_id,
+            "game_id": rng.choice(dataset.game_ids),
+            "author_id": author_id,
+            "platform": rng.choice(PLATFORMS),
+            "skill_level": rng.randint(0, 10),
+            "goal": _text(rng, 3)[:100],
+            "slots": slots,
+            "filled_slots": len(members),
+            "start_time": start_time + timedelta(hours=rng.randint(0, 24 * 60)),
+            "description": _text(rng, rng.randint(5, 30)),
+        })
+        memberships.extend(
+            {"lobby_id": lobby_id, "user_id": user_id} for user_id in members
+        )
+        dataset.lobby_authors[lobby_id] = author_id
+
+    insert(Lobby.__table__, lobbies)
+    insert(lobby_users, memberships)
+    dataset.lobby_ids = [lobby["id"] for lobby in lobbies]
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        # id заданы явно, последовательности нужно сдвинуть вручную
+        for table in ("users", "games", "bids", "lobbies"):
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT coalesce(max(id), 1) FROM {table}))"
+            ))
+
+    db.session.commit()
+    return dataset
@@ -0,0 +1,98 @@
+"""
+Бенчмарк сериализации больших списков: ORM объекты + model_validate на
+каждую строку против проекции колонок со сборкой json напрямую из строк.
+По умолчанию работает на SQLite в памяти, для PostgreSQL задайте
+DATABASE_URI (таблицы будут созданы, данные бенчмарка удалены в конце)
+"""
+import argparse
+import os
+import time
+from datetime import date
+
+import benchmarks  # noqa: F401  добавляет src/ в sys.path
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URI", "sqlite://")
+    from app import create_app
+    from extensions import db
+    from games.models import Game
+    from games.schemas import GameListSchema, GameSchemaRead
+    from games.services import GameService
+    from users.models import User
+    from users.schemas import UserReadSchema, UsersListSchema
+    from users.services import UserService
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            User(username=f"bench_user_{i}", password="x" * 120,
+                 gender="male", bio="bio " * 30)
+            for i in range(args.rows)
+        )
+        db.session.add_all(
+            Game(name=f"bench game {i}", description="description " * 20,
+                 release_date=date(2020, 1, 1))
+            for i in range(args.rows)
+        )
+        db.session.commit()
+
+        def users_orm():
+            db.session.expunge_all()
+            users = UserService.get_all()
+            return UsersListSchema(users=[
+                UserReadSchema.model_validate(user, from_attributes=True)
+                for user in users.items
+            ]).model_dump_json()
+
+        def games_orm():
+            db.session.expunge_all()
+            games = GameService.get_all()
+            return GameListSchema(games=[
+                GameSchemaRead.model_validate(game, from_attributes=True)
+                for game in games.items
+            ]).model_dump_json()
+
+        def users_projected():
+            from pydantic_core import to_json
+            users = UserService.get_all_rows()
+            return to_json({"users": users.items, "next_cursor": None})
+
+        def games_projected():
+            from pydantic_core import to_json
+            games = GameService.get_all_rows()
+            return to_json({"games": games.items, "next_cursor": None})
+
+        print(f"{args.rows} rows, best of {args.repeat}")
+        for name, orm, projected in [
+            ("users", users_orm, users_projected),
+            ("games", games_orm, games_projected),
+        ]:
+            orm_ms, orm_size = measure(orm, args.repeat)
+            fast_ms, fast_size = measure(projected, args.repeat)
+            print(f"{name}: orm {orm_ms:8.1f} ms ({orm_size} B), "
+                  f"projection {fast_ms:8.1f} ms ({fast_size} B), "
+                  f"speedup {orm_ms / fast_ms:.2f}x")
+
+        db.session.query(User).filter(User.username.like("bench_user_%")).delete()
+        db.session.query(Game).filter(Game.name.like("bench game %")).delete()
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Микробенчмарк накладных расходов цепочки декораторов rest_api на один
+запрос: сравнивает прежний разбор аннотаций на каждом запросе
+(get_func_instance_arg в jwt_auth и pydantic_validation) с исполнением
+заранее составленного плана связывания
+"""
+import argparse
+import timeit
+from functools import wraps
+from typing import get_type_hints
+
+import benchmarks  # noqa: F401  добавляет src/ в sys.path
+
+from flask import Flask, Response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from pydantic import BaseModel
+from werkzeug.exceptions import Unauthorized
+
+from core.exception_catcher import exception_catcher
+from core.pagination import PageParams
+from core.rest_api_extension import rest_api
+
+
+class BodySchema(BaseModel):
+    name: str
+    count: int
+
+
+class ResultSchema(BaseModel):
+    name: str
+    count: int
+    limit: int
+
+
+def get_func_instance_arg(func, instance_type):
+    """
+    Прежний core.utils.get_func_instance_arg: аргумент функции по его
+    сигнатурному типу, аннотации разбираются при каждом вызове
+    """
+    args_types = get_type_hints(func)
+
+    current_type, arg_name = None, None
+    for arg in args_types:
+        arg_type = args_types[arg]
+        if issubclass(arg_type, instance_type):
+            current_type = arg_type
+            arg_name = arg
+
+    return current_type, arg_name
+
+
+def legacy_stack(view):
+    """
+    Повторяет поведение декораторов до появления плана связывания:
+    каждый слой вызывает get_type_hints на каждом запросе
+    """
+    from users.models import User
+
+    @wraps(view)
+    def validation_wrapper(*args, **kwargs):
+        schema, arg_name = get_func_instance_arg(view, BaseModel)
+        if schema is not None:
+            kwargs[arg_name] = schema(**request.get_json())
+        _, page_arg = get_func_instance_arg(view, PageParams)
+        if page_arg is not None:
+            kwargs[page_arg] = PageParams.from_request_args(request.args)
+        return Response(view(*args, **kwargs).model_dump_json(), status=200,
+                        content_type="application/json")
+
+    @wraps(validation_wrapper)
+    def auth_wrapper(*args, **kwargs):
+        _, arg_name = get_func_instance_arg(validation_wrapper, User)
+        if arg_name is None:
+            return validation_wrapper(*args, **kwargs)
+
+        try:
+            verify_jwt_in_request()
+            user = User.query.filter_by(id=int(get_jwt_identity())).first()
+            kwargs[arg_name] = user
+            if not user:
+                raise Unauthorized("User not exist for this token or it expired")
+
+            return validation_wrapper(*args, **kwargs)
+
+        except (PyJWTError, JWTExtendedException) as e:
+            raise Unauthorized(str(e))
+
+    return exception_catcher(auth_wrapper)
+
+
+def view(body: BodySchema, page: PageParams):
+    return ResultSchema(name=body.name, count=body.count, limit=page.limit)
+
+
+def measure(func, number):
+    app = Flask(__name__)
+    with app.test_request_context(
+        "/?limit=10", method="POST", json={"name": "bench", "count": 1}
+    ):
+        func()
+        timer = timeit.Timer(func)
+        best = min(timer.repeat(repeat=5, number=number))
+    return best / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    legacy = legacy_stack(view)
+    planned = rest_api(responses=[{200: ResultSchema}])(view)
+
+    legacy_us = measure(legacy, args.number)
+    planned_us = measure(planned, args.number)
+
+    print(f"legacy (per-request introspection): {legacy_us:8.2f} us/request")
+    print(f"binding plan (rest_api):            {planned_us:8.2f} us/request")
+    print(f"speedup: {legacy_us / planned_us:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
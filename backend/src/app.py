@@ -1,15 +1,14 @@
 from flask import Flask
 from dotenv import load_dotenv
-from os import getenv
+from os import getenv, path
+from tempfile import gettempdir
 
-from extensions import db, migrate, jwt, swagger
-from lobbies.views import lobbies_bp
+from extensions import db, migrate, jwt, pubsub, identity_cache, \
+    password_hasher, event_streams, compression, replica_routing, metrics, \
+    rate_limiter, game_catalog
 
-from users.views import users_bp
-from games.views import games_bp
-from bids.views import bids_bp
-
-from core.openapi import register_openapi_spec_endpoint
+from core.openapi import register_openapi_spec_endpoint, register_swagger_ui
+from database.explain import register_index_check
 
 load_dotenv()
 
@@ -22,9 +21,103 @@ CONFIG = {
         "POSTGRES_USER": getenv("POSTGRES_USER", "postgres"),
         "POSTGRES_PASSWORD": getenv("POSTGRES_PASSWORD", "postgres"),
         "POSTGRES_DB": getenv("POSTGRES_DB", "postgres"),
+        # Полный URI БД вместо параметров выше (бенчмарки, локальные тесты)
+        "URI": getenv("DATABASE_URI"),
+        # Пул соединений на воркер, при gthread должен быть не меньше
+        # числа потоков воркера
+        "POOL_SIZE": int(getenv("DB_POOL_SIZE", "5")),
+        "MAX_OVERFLOW": int(getenv("DB_MAX_OVERFLOW", "10")),
+        "POOL_TIMEOUT": float(getenv("DB_POOL_TIMEOUT", "10")),
+        "POOL_PRE_PING": getenv("DB_POOL_PRE_PING", "True").lower() == "true",
+        # Секунды, соединение пересоздается раньше чем его закроет сервер
+        "POOL_RECYCLE": int(getenv("DB_POOL_RECYCLE", "1800")),
+        # Миллисекунды, 0 - без ограничения
+        "STATEMENT_TIMEOUT": int(getenv("DB_STATEMENT_TIMEOUT", "5000")),
+        # URI реплик для чтения через запятую, пусто - все идет в основную БД
+        "REPLICA_URIS": [
+            uri.strip() for uri in getenv("DATABASE_REPLICA_URIS", "").split(",")
+            if uri.strip()
+        ],
+        # Сколько секунд после записи клиент читает из основной БД
+        "REPLICA_STICKY_SECONDS": float(getenv("DB_REPLICA_STICKY_SECONDS", "5")),
     },
     "DEBUG": getenv("DEBUG", "True").lower() == "true",
+    # Служебные эндпоинты без авторизации (/metrics, /internal/*), включать
+    # только там, где они недоступны снаружи
+    "INTERNAL_ENDPOINTS": getenv("INTERNAL_ENDPOINTS", "False").lower() == "true",
     "SECRET_KEY": getenv("SECRET_KEY", "50jhfhK6BXmcSTsADWXdy3jXiVmO6D6n"),
+    "PUBSUB": {
+        # memory - в пределах процесса, postgres - LISTEN/NOTIFY между воркерами
+        "BACKEND": getenv("PUBSUB_BACKEND", "memory"),
+    },
+    "EVENT_STREAMS": {
+        # Открытых SSE потоков на воркер, сверх лимита 503 с Retry-After.
+        # Под gthread поток занимает поток воркера, gunicorn.conf.py
+        # оставляет половину потоков обычным запросам
+        "MAX_STREAMS": int(getenv("EVENT_STREAMS_MAX", "100")),
+        # Секунды до повторного подключения после 503
+        "RETRY_AFTER": int(getenv("EVENT_STREAMS_RETRY_AFTER", "10")),
+    },
+    "IDENTITY_CACHE": {
+        "MAX_SIZE": int(getenv("IDENTITY_CACHE_MAX_SIZE", "10000")),
+        "TTL": float(getenv("IDENTITY_CACHE_TTL", "60")),
+    },
+    "PASSWORD_HASHING": {
+        # При смене метода пароли перехешируются при следующем входе
+        "METHOD": getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256"),
+        # 0 - хешировать в процессе воркера
+        "POOL_SIZE": int(getenv("PASSWORD_HASH_POOL_SIZE", "2")),
+        "MAX_CONCURRENCY": int(getenv("PASSWORD_HASH_MAX_CONCURRENCY", "4")),
+        "QUEUE_TIMEOUT": float(getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2")),
+    },
+    "COMPRESSION": {
+        # Ответы меньше порога не сжимаются, выигрыш не окупает CPU
+        "MIN_SIZE": int(getenv("COMPRESSION_MIN_SIZE", "500")),
+        "LEVEL": int(getenv("COMPRESSION_LEVEL", "6")),
+        # Объем кеша сжатых ответов с ETag на воркер
+        "CACHE_MAX_BYTES": int(getenv("COMPRESSION_CACHE_MAX_BYTES",
+                                      str(16 * 1024 * 1024))),
+    },
+    "METRICS": {
+        "ENABLED": getenv("METRICS_ENABLED", "True").lower() == "true",
+        # Каталог файлов воркеров gunicorn для общего /metrics, пусто -
+        # метрики только текущего процесса
+        "DIRECTORY": getenv("METRICS_DIR"),
+        # Секунды между сбросами состояния воркера в файл
+        "FLUSH_INTERVAL": float(getenv("METRICS_FLUSH_INTERVAL", "5")),
+        # Миллисекунды, запросы дольше пишутся в лог teamsync.slow_query,
+        # 0 - лог выключен
+        "SLOW_QUERY_MS": float(getenv("SLOW_QUERY_MS", "200")),
+    },
+    "RATE_LIMIT": {
+        "ENABLED": getenv("RATE_LIMIT_ENABLED", "True").lower() == "true",
+        # memory - ведра в процессе, shared - файл в памяти общий для
+        # воркеров хоста (ставится в gunicorn.conf.py)
+        "BACKEND": getenv("RATE_LIMIT_BACKEND", "memory"),
+        "PATH": getenv("RATE_LIMIT_PATH", path.join(gettempdir(),
+                                                    "teamsync-ratelimit.bin")),
+        # Число одновременно отслеживаемых ключей
+        "SLOTS": int(getenv("RATE_LIMIT_SLOTS", "65536")),
+        # Заголовок с адресом клиента от nginx, пусто - адрес соединения
+        "IP_HEADER": getenv("RATE_LIMIT_IP_HEADER", "X-Real-IP"),
+        # Сети прокси через запятую, заголовку верим только если
+        # соединение пришло из них (gunicorn.conf.py добавляет частные
+        # сети docker, где живет nginx)
+        "TRUSTED_PROXIES": [
+            network.strip() for network in getenv(
+                "RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1/32,::1/128"
+            ).split(",") if network.strip()
+        ],
+    },
+    "GAMES_CACHE": {
+        "ENABLED": getenv("GAMES_CACHE_ENABLED", "True").lower() == "true",
+        # Секунды между проверками версии каталога в БД
+        "CHECK_INTERVAL": float(getenv("GAMES_CACHE_CHECK_INTERVAL", "1")),
+        # Число готовых страниц GET /api/games на воркер
+        "PAGE_CACHE_SIZE": int(getenv("GAMES_CACHE_PAGE_CACHE_SIZE", "256")),
+    },
+    # Swagger UI на /api/docs/, flasgger импортируется при первом открытии
+    "SWAGGER_UI": getenv("SWAGGER_UI", "True").lower() == "true",
     "SWAGGER": {
         "swagger_ui_bundle_js": "//unpkg.com/swagger-ui-dist@3/swagger-ui-bundle.js",
         "swagger_ui_standalone_preset_js": "//unpkg.com/swagger-ui-dist@3/swagger-ui-standalone-preset.js",
@@ -57,24 +150,112 @@ def set_config(app):
         app.config[param] = CONFIG[param]
 
     db_conf = app.config["DATABASE"]
-    app.config["SQLALCHEMY_DATABASE_URI"] = (
+    app.config["SQLALCHEMY_DATABASE_URI"] = db_conf["URI"] or (
         f'postgresql://{db_conf["POSTGRES_USER"]}:'
         f'{db_conf["POSTGRES_PASSWORD"]}@{db_conf["POSTGRES_HOST"]}'
         f':{db_conf["POSTGRES_PORT"]}/{db_conf["POSTGRES_DB"]}'
     )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+        app.config["SQLALCHEMY_DATABASE_URI"], db_conf
+    )
+    app.config["SQLALCHEMY_BINDS"] = {
+        f"replica_{number}": {"url": uri, **engine_options(uri, db_conf)}
+        for number, uri in enumerate(db_conf["REPLICA_URIS"])
+    }
+
+
+def engine_options(uri, db_conf):
+    """
+    Параметры пула и соединений, для SQLite (бенчмарки, локальные
+    запуски) остаются настройки SQLAlchemy по умолчанию
+    """
+    if not uri.startswith("postgresql"):
+        return {}
+
+    options = {
+        "pool_size": db_conf["POOL_SIZE"],
+        "max_overflow": db_conf["MAX_OVERFLOW"],
+        "pool_timeout": db_conf["POOL_TIMEOUT"],
+        "pool_pre_ping": db_conf["POOL_PRE_PING"],
+        "pool_recycle": db_conf["POOL_RECYCLE"],
+    }
+    if db_conf["STATEMENT_TIMEOUT"]:
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={db_conf['STATEMENT_TIMEOUT']}"
+        }
+    return options
 
 
 def register_blueprints(app):
+    # Вьюхи (а через них сервисы и модели) импортируются при создании
+    # приложения, импорт app.py ради CONFIG их не тянет
+    from users.views import users_bp
+    from games.views import games_bp
+    from bids.views import bids_bp
+    from lobbies.views import lobbies_bp
+    from dashboard.views import dashboard_bp
+
     app.register_blueprint(users_bp)
     app.register_blueprint(games_bp)
     app.register_blueprint(bids_bp)
     app.register_blueprint(lobbies_bp)
+    app.register_blueprint(dashboard_bp)
 
 
 def register_extensions(app):
     db.init_app(app)
+    metrics.init_app(app)
     migrate.init_app(app, db, directory="database/migrations/")
     jwt.init_app(app)
+    pubsub.init_app(app)
+    replica_routing.init_app(app, db, pubsub)
+    identity_cache.init_app(app, pubsub)
+    game_catalog.init_app(app, pubsub)
+    event_streams.init_app(app, pubsub)
+    password_hasher.init_app(app)
+    compression.init_app(app)
+    rate_limiter.init_app(app)
     register_openapi_spec_endpoint(app)
-    swagger.init_app(app)
+    register_index_check(app)
+    register_swagger_ui(app)
+
+
+def warm_up(app):
+    """
+    Подготовка которую иначе оплачивает первый запрос каждого воркера:
+    конфигурация мапперов SQLAlchemy и стратегий загрузки, достройка
+    схем pydantic вьюх, компиляция правил URL. Соединения с БД не
+    открываются. Под gunicorn с preload вызывается в мастере (wsgi.py),
+    воркеры получают результат через fork
+    """
+    import gc
+
+    from sqlalchemy import select
+    from sqlalchemy.orm import configure_mappers
+
+    configure_mappers()
+    with app.app_context():
+        dialect = db.engine.dialect
+        for mapper in db.Model.registry.mappers:
+            # Компиляция без выполнения создает стратегии загрузки колонок
+            # и связей, которые иначе создаются на первом запросе
+            select(mapper.class_).compile(dialect=dialect)
+
+    for view in app.view_functions.values():
+        plan = getattr(view, "_binding_plan", None)
+        if plan is None:
+            continue
+        for schema in (plan.body_schema, plan.response_schema):
+            # Схемы с неразрешенными ссылками достраиваются при первой
+            # валидации
+            if schema is not None and not schema.__pydantic_complete__:
+                schema.model_rebuild()
+
+    app.url_map.update()
+
+    # Объекты старта переносятся в постоянное поколение: полная сборка
+    # мусора не обходит их на первых запросах и не трогает страницы
+    # памяти общие с мастером после fork
+    gc.collect()
+    gc.freeze()
@@ -1,7 +1,17 @@
-from app import db
+from extensions import db
 
 class Bid(db.Model):
     __tablename__ = "bids"
+    __table_args__ = (
+        db.Index(
+            "ix_bids_description_trgm", "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+        # Заявки игры (Game.bids) и автора (User.bids), в порядке id
+        db.Index("ix_bids_game_id_id", "game_id", "id"),
+        db.Index("ix_bids_author_id_id", "author_id", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     game = db.relationship("Game", back_populates="bids")
     game_id = db.Column(db.Integer, db.ForeignKey('games.id'), nullable=False)
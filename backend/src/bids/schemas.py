@@ -5,6 +5,7 @@ from pydantic.fields import Field
 from typing import Optional, List
 from games.schemas import GameSchemaRead
 from users.schemas import UserReadSchema
+from core.normalization import IncludedSchema
 
 
 class BidSchemaWrite(BaseModel):
@@ -27,4 +28,17 @@ class BidSchemaRead(BidSchemaWrite):
     model_config = ConfigDict(from_attributes=True)
 
 class BidListSchema(BaseModel):
-    bids: List[BidSchemaRead]
\ No newline at end of file
+    bids: List[BidSchemaRead]
+    next_cursor: Optional[str] = None
+
+
+# Заявка нормализованного списка, игра и автор лежат в included
+class BidRefSchema(BidSchemaWrite):
+    id: int
+    author_id: int
+
+
+class BidListNormalizedSchema(BaseModel):
+    bids: List[BidRefSchema]
+    included: IncludedSchema
+    next_cursor: Optional[str] = None
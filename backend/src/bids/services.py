@@ -1,29 +1,86 @@
-from app import db
+from sqlalchemy.orm import joinedload, contains_eager
+
+from extensions import db
+from core.conditional_get import bump_versions
+from core.fieldsets import ALL_FIELDS, FieldSet
+from core.normalization import build_included, ref_row
+from core.pagination import paginate, Page, PageParams
+from core.replicas import read_only
+from core.search import SubstringSearch
 from bids.models import Bid
 from games.models import Game
-from bids.schemas import BidSchemaWrite, BidSchemaRead
+from bids.schemas import BidSchemaWrite, BidSchemaRead, BidRefSchema, \
+    BidListNormalizedSchema
 
 
 class BidService:
     @staticmethod
-    def get_by_id(id: int):
-        return db.session.get(Bid, id)
+    def read_options(fields: FieldSet = ALL_FIELDS):
+        """
+        Стратегии загрузки связей под форму ответа BidSchemaRead,
+        сужаются до полей fields
+        """
+        return fields.loader_options(Bid, {
+            "game": joinedload,
+            "author": joinedload,
+        })
+
+    @staticmethod
+    def list_options(fields: FieldSet = ALL_FIELDS):
+        """
+        Тоже что read_options, но games уже присоединена через join
+        для фильтрации
+        """
+        return fields.loader_options(Bid, {
+            "game": contains_eager,
+            "author": joinedload,
+        })
 
     @staticmethod
-    def get_all(desc=None, game_name=None):
-        query = db.session.query(Bid).join(Game)
+    def get_by_id(id: int, fields: FieldSet = ALL_FIELDS):
+        return db.session.get(Bid, id, options=BidService.read_options(fields))
 
-        if desc:
-            query = query.filter(Bid.description.like(f'%{desc}%'))
+    @staticmethod
+    @read_only
+    def get_all(desc=None, game_name=None, page: PageParams = None,
+                options=None, fields: FieldSet = ALL_FIELDS):
+        if options is None:
+            options = BidService.list_options(fields)
 
-        if game_name:
-            query = query.filter(Game.name.like(f'%{game_name}%'))
+        query = (
+            db.session.query(Bid)
+            .join(Game)
+            .options(*options)
+        )
 
-        return query.all()
+        search = (
+            SubstringSearch()
+            .add(Bid.description, desc)
+            .add(Game.name, game_name)
+        )
+        query = search.apply(query)
+
+        return paginate(query, search.sort_keys(Bid.id), page)
+
+    @staticmethod
+    def normalize(page: Page) -> BidListNormalizedSchema:
+        """
+        Нормализованная страница заявок загруженных без связей
+        (options=()): авторы и игры страницы по одному разу в included
+        """
+        return BidListNormalizedSchema.model_validate({
+            "bids": [ref_row(bid, BidRefSchema) for bid in page.items],
+            "included": build_included(
+                {bid.author_id for bid in page.items},
+                {bid.game_id for bid in page.items},
+            ),
+            "next_cursor": page.next_cursor,
+        })
 
     @staticmethod
     def create(obj: BidSchemaWrite, user) -> BidSchemaRead:
         bid = Bid(game_id=obj.game_id, description=obj.description, details=obj.details, author_id=user.id, author=user)
         db.session.add(bid)
+        bump_versions("bids")
         db.session.commit()
         return bid
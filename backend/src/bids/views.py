@@ -1,8 +1,13 @@
 from flask import Blueprint, request
+from core.fieldsets import FieldSet
+from core.normalization import normalized_requested
+from core.pagination import PageParams
+from core.rate_limit import RateLimit
 from core.rest_api_extension import rest_api
 from users.models import User
 from bids.models import Bid
-from bids.schemas import BidSchemaWrite, BidSchemaRead, BidListSchema
+from bids.schemas import BidSchemaWrite, BidSchemaRead, BidListSchema, \
+    BidListNormalizedSchema
 from bids.services import BidService
 from werkzeug.exceptions import NotFound
 
@@ -30,24 +35,42 @@ def create_bid(bid_obj: BidSchemaWrite, user: User):
 
 @bids_bp.route("", methods=["GET"])
 @rest_api(
-    description="Получение списка заявок",
-    responses=[{200: BidListSchema}],
-    query_params=["game_search", "description_search"]
+    description="Получение списка заявок. С normalized=true ответ имеет"
+                " форму BidListNormalizedSchema: заявки содержат id автора и"
+                " игры, а пользователи и игры по одному разу в included",
+    responses=[{200: BidListSchema}, {200: BidListNormalizedSchema}],
+    query_params=["game_search", "description_search", "normalized"],
+    etag_resources=["bids", "games", "users"],
+    # Полнотекстовый поиск по описанию самый дорогой запрос на чтение
+    rate_limit=RateLimit(
+        limit=30, period=60, key="ip",
+        when=lambda: bool(request.args.get("description_search")),
+    ),
 )
-def get_bids_list():
+def get_bids_list(page: PageParams, fields: FieldSet):
     desc_search = request.args.get('description_search')
     game_search = request.args.get('game_search')
-    bids = BidService.get_all(desc=desc_search, game_name=game_search)
-    return BidListSchema(bids=[BidSchemaRead.model_validate(bid, from_attributes=True) for bid in bids] if bids else [])
+    normalized = normalized_requested(fields)
+    bids = BidService.get_all(desc=desc_search, game_name=game_search,
+                              page=page, options=() if normalized else None,
+                              fields=fields)
+    if normalized:
+        return BidService.normalize(bids)
+
+    return fields.schema(BidListSchema).model_validate(
+        {"bids": bids.items, "next_cursor": bids.next_cursor},
+        from_attributes=True,
+    )
 
 
 @bids_bp.route("/<int:bid_id>", methods=["GET"])
 @rest_api(
     description="Получение заявки по id",
     responses=[{200: BidSchemaRead}],
+    etag_resources=["bids", "games", "users"],
 )
-def get_bid(bid_id: int):
-    bid = BidService.get_by_id(bid_id)
+def get_bid(bid_id: int, fields: FieldSet):
+    bid = BidService.get_by_id(bid_id, fields)
     if bid is None:
         raise NotFound("Bid with such id do not exist")
-    return BidSchemaRead.model_validate(bid, from_attributes=True)
+    return fields.schema(BidSchemaRead).model_validate(bid, from_attributes=True)
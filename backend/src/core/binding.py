@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+from typing import Optional, Type, get_type_hints
+
+from pydantic import BaseModel
+
+from core.fieldsets import FieldSet
+from core.pagination import PageParams
+
+
+@dataclass(frozen=True)
+class BindingPlan:
+    """
+    План связывания аргументов вьюхи, составляется один раз при
+    декорировании, чтобы декораторы не разбирали аннотации на каждом запросе
+    """
+    user_arg: Optional[str] = None
+    body_arg: Optional[str] = None
+    body_schema: Optional[Type[BaseModel]] = None
+    page_arg: Optional[str] = None
+    fields_arg: Optional[str] = None
+    response_schema: Optional[Type[BaseModel]] = None
+
+    def serialize(self, content):
+        """
+        Сериализует pydantic объект ответа в json, для объявленной схемы
+        ответа сразу используется ее собранный сериализатор
+        """
+        if type(content) is self.response_schema:
+            return self.response_schema.__pydantic_serializer__.to_json(
+                content
+            )
+        return content.model_dump_json()
+
+
+def _find_arg(hints, instance_type):
+    current_type, arg_name = None, None
+    for arg, arg_type in hints.items():
+        if arg == "return" or not isinstance(arg_type, type):
+            continue
+        if issubclass(arg_type, instance_type):
+            current_type, arg_name = arg_type, arg
+
+    return current_type, arg_name
+
+
+def _success_schema(responses):
+    for response in responses or []:
+        for status_code, schema in response.items():
+            if 200 <= status_code < 300:
+                return schema
+    return None
+
+
+def compile_binding_plan(view, responses=None) -> BindingPlan:
+    from users.models import User
+
+    hints = get_type_hints(view)
+    _, user_arg = _find_arg(hints, User)
+    body_schema, body_arg = _find_arg(hints, BaseModel)
+    _, page_arg = _find_arg(hints, PageParams)
+    _, fields_arg = _find_arg(hints, FieldSet)
+
+    return BindingPlan(
+        user_arg=user_arg,
+        body_arg=body_arg,
+        body_schema=body_schema,
+        page_arg=page_arg,
+        fields_arg=fields_arg,
+        response_schema=_success_schema(responses),
+    )
+
+
+def get_binding_plan(view) -> BindingPlan:
+    """
+    Возвращает план вьюхи, rest_api составляет его заранее, а при
+    использовании декораторов по отдельности план составляется первым из них.
+    functools.wraps копирует атрибут плана во все внешние обертки
+    """
+    plan = getattr(view, "_binding_plan", None)
+    if plan is None:
+        plan = compile_binding_plan(view)
+        view._binding_plan = plan
+    return plan
@@ -0,0 +1,130 @@
+import gzip
+import zlib
+from collections import OrderedDict
+from threading import Lock
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/xml",
+    "text/javascript",
+}
+
+
+class Compression:
+    """
+    Сжатие ответов по Accept-Encoding: br (если установлен brotli), gzip
+    или deflate. Маленькие и потоковые ответы (SSE) не сжимаются. Для
+    ответов с ETag сжатые байты кешируются по паре (ETag, кодировка),
+    поэтому спецификация и неизменившиеся списки сжимаются один раз
+    """
+    def __init__(self):
+        self.min_size = 500
+        self.level = 6
+        self.cache_max_bytes = 0
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = Lock()
+
+    def init_app(self, app):
+        config = app.config["COMPRESSION"]
+        self.min_size = config["MIN_SIZE"]
+        self.level = config["LEVEL"]
+        self.cache_max_bytes = config["CACHE_MAX_BYTES"]
+        app.after_request(self.compress_response)
+        app.extensions["compression"] = self
+
+    def _encodings(self):
+        encodings = ["gzip", "deflate"]
+        if brotli is not None:
+            encodings.insert(0, "br")
+        return encodings
+
+    def negotiate(self, accept_encodings) -> str:
+        """
+        Кодировка с наибольшим q из поддерживаемых, при равенстве
+        выбирается первая в порядке br, gzip, deflate
+        """
+        best, best_quality = None, 0
+        for encoding in self._encodings():
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            # Уровень 11 слишком медленный для динамических ответов
+            return brotli.compress(data, quality=min(self.level, 11))
+        if encoding == "gzip":
+            return gzip.compress(data, compresslevel=self.level, mtime=0)
+        return zlib.compress(data, self.level)
+
+    def _cached(self, key):
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+            return data
+
+    def _remember(self, key, data):
+        if len(data) > self.cache_max_bytes:
+            return
+
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = data
+            self._cache_bytes += len(data)
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def compress_response(self, response):
+        if (
+            response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.direct_passthrough
+            or response.is_streamed
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+
+        if (
+            not 200 <= response.status_code < 300
+            or response.status_code == 204
+            or "Content-Encoding" in response.headers
+            or response.content_length is None
+            or response.content_length < self.min_size
+        ):
+            return response
+
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag else None
+        data = self._cached(key) if key else None
+        if data is None:
+            data = self.compress(response.get_data(), encoding)
+            if key:
+                self._remember(key, data)
+
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        if etag and not weak:
+            # Сжатое представление побайтно отличается от исходного
+            response.set_etag(etag, weak=True)
+        return response
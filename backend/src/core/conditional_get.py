@@ -0,0 +1,113 @@
+import random
+from functools import wraps
+from hashlib import sha1
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import BigInteger, cast, func, select
+
+from core.binding import get_binding_plan
+from database.models import ResourceVersion
+from database.upsert import upsert_insert
+from extensions import db
+
+
+# Число строк счетчика ресурса. Каждая запись блокирует одну случайную
+# строку до commit, с одной строкой все записи ресурса выстраивались бы
+# в очередь. Остальные ресурсы пишутся редко и держат одну строку
+VERSION_SHARDS = {"lobbies": 16, "bids": 16}
+
+
+def bump_versions(*names) -> dict:
+    """
+    Увеличивает версии ресурсов в текущей транзакции, вызывать прямо
+    перед commit, чтобы блокировка строки счетчика держалась минимально.
+    Увеличивается случайная строка счетчика, имена сортируются, чтобы
+    параллельные транзакции не ловили deadlock. Возвращает новые версии
+    ресурсов из одной строки, версию разнесенного счетчика внутри
+    транзакции точно не узнать, параллельные записи в другие строки
+    еще не видны
+    """
+    statement = upsert_insert(ResourceVersion).values([
+        {
+            "name": name,
+            "shard": random.randrange(VERSION_SHARDS.get(name, 1)),
+            "version": 1,
+        }
+        for name in sorted(set(names))
+    ])
+    rows = db.session.execute(statement.on_conflict_do_update(
+        index_elements=[ResourceVersion.name, ResourceVersion.shard],
+        set_={"version": ResourceVersion.version + 1},
+    ).returning(ResourceVersion.name, ResourceVersion.version)).all()
+    return {
+        name: version for name, version in rows
+        if VERSION_SHARDS.get(name, 1) == 1
+    }
+
+
+def get_versions(names) -> dict:
+    rows = db.session.execute(
+        select(ResourceVersion.name,
+               cast(func.sum(ResourceVersion.version), BigInteger))
+        .where(ResourceVersion.name.in_(names))
+        .group_by(ResourceVersion.name)
+    ).all()
+    return dict(rows)
+
+
+def request_version(name):
+    """
+    Версия ресурса из которой conditional_get собрал ETag текущего
+    запроса, None если он ее не читал. Кеш отдающий тело под этим ETag
+    должен соответствовать именно ей, иначе клиент закеширует старое
+    тело с новым ETag
+    """
+    if not has_request_context():
+        return None
+    return g.get("resource_versions", {}).get(name)
+
+
+def conditional_get(resources):
+    """
+    Weak ETag для GET эндпоинтов из версий ресурсов, url запроса и
+    пользователя. При совпадении If-None-Match отвечает 304 не выполняя
+    вьюху, то есть без запросов строк и сериализации
+    """
+    resources = tuple(sorted(resources or ()))
+
+    def decorator(view):
+        if not resources:
+            return view
+
+        user_arg = get_binding_plan(view).user_arg
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+
+            versions = get_versions(resources)
+            g.resource_versions = {
+                name: versions.get(name, 0) for name in resources
+            }
+            user = kwargs.get(user_arg) if user_arg else None
+            key = "|".join(
+                [request.full_path, str(user.id if user else "")]
+                + [f"{name}:{versions.get(name, 0)}" for name in resources]
+            )
+            etag = sha1(key.encode()).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
@@ -18,6 +18,12 @@ def exception_catcher(func):
             if e.description is not None:
                 response_kwargs["response"] = json.dumps({"detail": e.description})
 
-            return Response(**response_kwargs)
+            response = Response(**response_kwargs)
+            # Заголовки исключения, например Retry-After у 429
+            for header, value in e.get_headers():
+                if header.lower() != "content-type":
+                    response.headers[header] = value
+
+            return response
 
     return wrapper
\ No newline at end of file
@@ -0,0 +1,228 @@
+from copy import copy
+from functools import lru_cache, wraps
+from typing import List, Optional, Union, get_args, get_origin
+
+from flask import request
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import load_only, selectinload
+from werkzeug.exceptions import BadRequest
+
+MAX_FIELDS = 50
+
+
+class FieldSet:
+    """
+    Набор полей ответа из query параметра fields, например
+    fields=id,description,author.username,game. Пути задаются относительно
+    ресурса (для списков относительно элемента), связь без вложенных полей
+    означает все ее поля. Пустой FieldSet означает все поля: схемы и
+    стратегии загрузки остаются полными
+    """
+    def __init__(self, tree: Optional[dict] = None):
+        self.tree = tree or {}
+
+    def __bool__(self):
+        return bool(self.tree)
+
+    @property
+    def key(self) -> tuple:
+        """
+        Канонический вид набора, ключ кеша частичных схем
+        """
+        return _freeze(self.tree)
+
+    @property
+    def names(self) -> tuple:
+        return tuple(self.tree)
+
+    @classmethod
+    def parse(cls, value: Optional[str], schema) -> "FieldSet":
+        """
+        Разбирает значение fields и проверяет пути по схеме ресурса
+        """
+        if not value:
+            return cls()
+
+        paths = [path.strip() for path in value.split(",") if path.strip()]
+        if len(paths) > MAX_FIELDS:
+            raise BadRequest(f"fields accepts at most {MAX_FIELDS} paths")
+
+        tree = {}
+        for path in paths:
+            node, current = tree, schema
+            for name in path.split("."):
+                if current is None or name not in current.model_fields:
+                    raise BadRequest(f"Unknown field '{path}'")
+                current = _model_of(current.model_fields[name].annotation)
+                node = node.setdefault(name, {})
+        return cls(tree)
+
+    def schema(self, schema):
+        """
+        Схема ответа только с выбранными полями. Для схемы страницы
+        списка сужаются ее элементы
+        """
+        if not self:
+            return schema
+        return _partial_schema(schema, self.key)
+
+    def loader_options(self, model, loaders: dict) -> tuple:
+        """
+        Стратегии загрузки под набор полей: load_only для колонок и
+        стратегии из loaders (имя связи -> joinedload, selectinload,
+        contains_eager...) только для выбранных связей. Для пустого
+        набора загружаются все связи из loaders со всеми колонками
+        """
+        if not self:
+            return tuple(
+                strategy(getattr(model, name))
+                for name, strategy in loaders.items()
+            )
+        return tuple(_loader_options(model, self.tree, loaders))
+
+
+ALL_FIELDS = FieldSet()
+
+
+def _freeze(tree):
+    return tuple(sorted((name, _freeze(sub)) for name, sub in tree.items()))
+
+
+def _thaw(key):
+    return {name: _thaw(sub) for name, sub in key}
+
+
+def _model_of(annotation):
+    """
+    Pydantic схема внутри аннотации поля (X, list[X], Optional[X])
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = _model_of(arg)
+        if model is not None:
+            return model
+    return None
+
+
+def _replace_model(annotation, model, partial):
+    if annotation is model:
+        return partial
+
+    origin = get_origin(annotation)
+    if origin in (list, List):
+        return List[_replace_model(get_args(annotation)[0], model, partial)]
+    if origin is Union:
+        return Union[tuple(
+            _replace_model(arg, model, partial) for arg in get_args(annotation)
+        )]
+    return annotation
+
+
+def _list_item_field(schema):
+    """
+    Поле элементов страницы списка: у схем списков есть next_cursor
+    и одно поле list[схема ресурса]
+    """
+    if "next_cursor" not in schema.model_fields:
+        return None, None
+    for name, field in schema.model_fields.items():
+        if get_origin(field.annotation) in (list, List):
+            model = _model_of(field.annotation)
+            if model is not None:
+                return name, model
+    return None, None
+
+
+@lru_cache(maxsize=512)
+def _partial_schema(schema, key):
+    tree = _thaw(key)
+    list_field, item_schema = _list_item_field(schema)
+    if list_field is not None:
+        # Схема списка: набор относится к элементам
+        definitions = {
+            name: (field.annotation, copy(field))
+            for name, field in schema.model_fields.items()
+        }
+        field = schema.model_fields[list_field]
+        definitions[list_field] = (
+            _replace_model(field.annotation, item_schema,
+                           _partial_schema(item_schema, key)),
+            copy(field),
+        )
+    else:
+        definitions = {}
+        for name, field in schema.model_fields.items():
+            if name not in tree:
+                continue
+            sub = tree[name]
+            annotation = field.annotation
+            model = _model_of(annotation)
+            if model is not None and sub:
+                annotation = _replace_model(annotation, model,
+                                            _partial_schema(model, _freeze(sub)))
+            # create_model меняет переданный FieldInfo, исходная схема
+            # должна остаться нетронутой
+            definitions[name] = (annotation, copy(field))
+
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(**{**schema.model_config,
+                                 "from_attributes": True}),
+        **definitions,
+    )
+
+
+def _loader_options(model, tree, loaders):
+    mapper = sa_inspect(model)
+    columns = [getattr(model, name) for name in tree
+               if name in mapper.column_attrs]
+    if not columns:
+        # Только связи, из колонок самой сущности нужен лишь ключ
+        columns = [getattr(model, column.key)
+                   for column in mapper.primary_key]
+
+    options = [load_only(*columns)]
+    for name, sub in tree.items():
+        if name not in mapper.relationships:
+            continue
+        strategy = loaders.get(name, selectinload)(getattr(model, name))
+        if sub:
+            target = mapper.relationships[name].mapper.class_
+            strategy = strategy.options(*_loader_options(target, sub, {}))
+        options.append(strategy)
+    return options
+
+
+def field_selection(view):
+    """
+    Передает во вьюху FieldSet из query параметра fields, если у нее
+    есть аргумент с типом FieldSet. Пути проверяются по схеме ответа
+    """
+    from core.binding import get_binding_plan
+
+    plan = get_binding_plan(view)
+    arg_name = plan.fields_arg
+    resource_schema = _resource_schema(plan.response_schema)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if arg_name is not None:
+            kwargs[arg_name] = FieldSet.parse(request.args.get("fields"),
+                                              resource_schema)
+
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _resource_schema(schema):
+    """
+    Схема ресурса к которой относятся пути fields: элемент для схемы
+    списка, иначе сама схема ответа
+    """
+    if schema is None:
+        return None
+    _, item_schema = _list_item_field(schema)
+    return item_schema or schema
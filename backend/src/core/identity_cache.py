@@ -0,0 +1,168 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app, jsonify
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+INVALIDATION_CHANNEL = "identity_cache_invalidate"
+
+
+class IdentityCache:
+    """
+    LRU/TTL кеш пользователей аутентифицированных по JWT, ключ это subject
+    токена (id пользователя). Хранятся только значения колонок без пароля,
+    на попадании объект User собирается и присоединяется к сессии без
+    запроса в БД. Изменение или удаление пользователя сбрасывает запись
+    во всех воркерах через pubsub, TTL ограничивает устаревание если
+    сообщение потерялось
+    """
+    def __init__(self, max_size: int = 10000, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._pubsub = None
+
+    def init_app(self, app, pubsub):
+        config = app.config["IDENTITY_CACHE"]
+        self.max_size = config["MAX_SIZE"]
+        self.ttl = config["TTL"]
+        self._pubsub = pubsub
+        pubsub.subscribe(INVALIDATION_CHANNEL, self._on_invalidate_message)
+        _register_model_events()
+
+        if app.config["INTERNAL_ENDPOINTS"]:
+            app.add_url_rule(
+                "/internal/identity-cache",
+                "identity_cache_stats",
+                lambda: jsonify(self.stats()),
+            )
+        app.extensions["identity_cache"] = self
+
+    def get_user(self, user_id: int):
+        """
+        Возвращает объект User присоединенный к текущей сессии или None
+        """
+        from extensions import db
+        from users.models import User
+
+        values = self._lookup(user_id)
+        if values is None:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                self._store(user_id, _snapshot(user))
+            return user
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def _lookup(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def _store(self, user_id, values):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def invalidate(self, user_id):
+        """
+        Сбрасывает запись локально и во всех остальных воркерах
+        """
+        self.discard(user_id)
+        if self._pubsub is not None:
+            self._pubsub.publish(INVALIDATION_CHANNEL, {"user_id": user_id})
+
+    def _on_invalidate_message(self, message):
+        self.discard(message["user_id"])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _snapshot(user):
+    state = inspect(user)
+    return {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key != "password" and attr.key in state.dict
+    }
+
+
+def _current_cache():
+    return current_app.extensions.get("identity_cache")
+
+
+def _remember_changed_user(mapper, connection, target):
+    # Сразу сбрасываем локально, а остальным воркерам сообщаем
+    # после коммита, когда новые данные уже видны
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("identity_invalidations", set()).add(target.id)
+
+    cache = _current_cache()
+    if cache is not None:
+        cache.discard(target.id)
+
+
+def _remember_updated_user(mapper, connection, target):
+    # after_update вызывается и при изменении только коллекций
+    # (например вступление в лобби), колонки при этом не меняются
+    session = object_session(target)
+    if session is None or session.is_modified(target,
+                                              include_collections=False):
+        _remember_changed_user(mapper, connection, target)
+
+
+def _publish_invalidations(session):
+    user_ids = session.info.pop("identity_invalidations", ())
+    cache = _current_cache() if user_ids else None
+    if cache is not None:
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+
+
+def _forget_invalidations(session):
+    session.info.pop("identity_invalidations", None)
+
+
+def _register_model_events():
+    from users.models import User
+
+    if event.contains(User, "after_delete", _remember_changed_user):
+        return
+
+    event.listen(User, "after_update", _remember_updated_user)
+    event.listen(User, "after_delete", _remember_changed_user)
+    event.listen(Session, "after_commit", _publish_invalidations)
+    event.listen(Session, "after_rollback", _forget_invalidations)
@@ -4,7 +4,8 @@ from flask_jwt_extended.exceptions import JWTExtendedException
 from werkzeug.exceptions import Unauthorized
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 
-from core.utils import get_func_instance_arg
+from core.binding import get_binding_plan
+from core.metrics import request_timer
 
 from jwt.exceptions import PyJWTError
 
@@ -13,20 +14,22 @@ def jwt_auth(view):
     Выполняет jwt аутентификацию пользователя исходя из токена
     в заголовке Authorization
     """
+    arg_name = get_binding_plan(view).user_arg
+
     @wraps(view)
     def wrapper(*args, **kwargs):
-        from users.models import User
+        from extensions import identity_cache
 
-        _, arg_name = get_func_instance_arg(view, User)
         if arg_name is None:
             return view(*args, **kwargs)
 
         try:
-            verify_jwt_in_request()
+            with request_timer("auth"):
+                verify_jwt_in_request()
 
-            user_identity = get_jwt_identity()
+                user_identity = get_jwt_identity()
 
-            user = User.query.filter_by(id=int(user_identity)).first()
+                user = identity_cache.get_user(int(user_identity))
             kwargs[arg_name] = user
             if not user:
                 raise Unauthorized("User not exist for this token or it expired")
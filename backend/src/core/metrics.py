@@ -0,0 +1,410 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = getLogger("teamsync.slow_query")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Имя метрики: (тип, описание, корзины гистограммы)
+METRICS = {
+    "teamsync_requests_total": (
+        "counter", "Запросы по эндпоинтам и статусам", None),
+    "teamsync_request_duration_seconds": (
+        "histogram", "Время обработки запроса", LATENCY_BUCKETS),
+    "teamsync_db_duration_seconds": (
+        "histogram", "Суммарное время SQL запросов за запрос", LATENCY_BUCKETS),
+    "teamsync_db_queries_per_request": (
+        "histogram", "Число SQL запросов за запрос", COUNT_BUCKETS),
+    "teamsync_phase_duration_seconds": (
+        "histogram", "Время этапов rest_api: auth, validation, serialization",
+        LATENCY_BUCKETS),
+    "teamsync_slow_queries_total": (
+        "counter", "SQL запросы дольше порога slow query log", None),
+}
+
+PHASES = ("auth", "validation", "serialization")
+
+# Сумма файлов завершившихся воркеров
+AGGREGATE_FILE = "aggregate.json"
+LOCK_FILE = "metrics.lock"
+# Секунды между проверками, какие воркеры завершились
+FOLD_INTERVAL = 60.0
+
+
+class MetricsRegistry:
+    """
+    Счетчики и гистограммы одного процесса, ключ это имя метрики и
+    отсортированные пары меток. Состояние сериализуется в json, чтобы
+    /metrics мог сложить состояния всех воркеров
+    """
+    def __init__(self):
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, name, labels, value=1):
+        key = _key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = _key(name, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Счетчики корзин, сумма, количество
+                state = self._values[key] = [0] * len(buckets) + [0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                json.dumps(key): value if isinstance(value, (int, float))
+                else list(value)
+                for key, value in self._values.items()
+            }
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def merge_snapshots(snapshots) -> dict:
+    merged = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            else:
+                merged[key] += value
+    return merged
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return (value.replace("\\", "\\\\").replace('"', '\\"')
+            .replace("\n", "\\n"))
+
+
+def render_prometheus(snapshot) -> str:
+    series = {}
+    for key, value in snapshot.items():
+        name, labels = json.loads(key)
+        series.setdefault(name, []).append(
+            ([tuple(pair) for pair in labels], value)
+        )
+
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series.get(name, [])):
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+
+            for bound, count in zip(buckets, value):
+                bucket_labels = _format_labels(labels + [("le", repr(float(bound)))])
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            inf_labels = _format_labels(labels + [("le", "+Inf")])
+            lines.append(f"{name}_bucket{inf_labels} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+
+
+@contextmanager
+def request_timer(phase: str):
+    """
+    Учитывает время блока в этапе phase текущего запроса, вне запроса
+    или с выключенными метриками ничего не делает
+    """
+    timings = g.get("request_timings") if has_request_context() else None
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] += time.perf_counter() - start
+
+
+class Metrics:
+    """
+    Инструментирование запросов: время запроса, число и время SQL (через
+    события движка SQLAlchemy), этапы rest_api. Результат уходит в
+    заголовок Server-Timing и в гистограммы Prometheus на /metrics.
+
+    Каждый воркер gunicorn периодически сбрасывает свое состояние в файл
+    METRICS["DIRECTORY"], а /metrics складывает файлы всех воркеров.
+    Имя файла содержит pid и время старта воркера, так что воркер с
+    переиспользованным pid не затрет файл предыдущего. Файлы завершившихся
+    воркеров складываются в AGGREGATE_FILE, чтобы их число не росло.
+    Без DIRECTORY /metrics отдает метрики только текущего процесса
+    """
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.directory = None
+        self.flush_interval = 5.0
+        self.slow_query_seconds = 0.0
+        self._last_flush = 0.0
+        self._last_fold = 0.0
+        self._flush_lock = Lock()
+        self._worker_pid = None
+        self._worker_name = None
+
+    def init_app(self, app):
+        config = app.config["METRICS"]
+        if not config["ENABLED"]:
+            return
+
+        self.directory = Path(config["DIRECTORY"]) if config["DIRECTORY"] else None
+        self.flush_interval = config["FLUSH_INTERVAL"]
+        self.slow_query_seconds = config["SLOW_QUERY_MS"] / 1000
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+        if not event.contains(Engine, "before_cursor_execute",
+                              self._before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute",
+                         self._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute",
+                         self._after_cursor_execute)
+            event.listen(Engine, "handle_error", self._handle_error)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        if app.config["INTERNAL_ENDPOINTS"]:
+            app.add_url_rule("/metrics", "metrics", self._metrics_view)
+        app.extensions["metrics"] = self
+
+    def _start_request(self):
+        g.request_timings = RequestTimings()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters,
+                               context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters,
+                              context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+
+        in_request = has_request_context()
+        timings = g.get("request_timings") if in_request else None
+        if timings is not None:
+            timings.db_time += duration
+            timings.db_queries += 1
+
+        if self.slow_query_seconds and duration >= self.slow_query_seconds:
+            endpoint = (request.endpoint or "unmatched") if in_request else "-"
+            self.registry.inc("teamsync_slow_queries_total",
+                              {"endpoint": endpoint})
+            slow_query_logger.warning(
+                "Slow query %.1f ms in %s: %s",
+                duration * 1000, endpoint, statement,
+            )
+
+    def _handle_error(self, context):
+        # after_cursor_execute не вызывается для упавшего запроса,
+        # иначе время старта осталось бы в соединении пула навсегда
+        connection = context.connection
+        if connection is None or context.is_pre_ping:
+            return
+        starts = connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
+    def _finish_request(self, response):
+        timings = g.pop("request_timings", None)
+        if timings is None:
+            return response
+
+        total = time.perf_counter() - timings.start
+        endpoint = request.endpoint or "unmatched"
+        labels = {"endpoint": endpoint, "method": request.method}
+
+        self.registry.inc("teamsync_requests_total",
+                          {**labels, "status": response.status_code})
+        self.registry.observe("teamsync_request_duration_seconds",
+                              labels, total)
+        self.registry.observe("teamsync_db_duration_seconds",
+                              labels, timings.db_time)
+        self.registry.observe("teamsync_db_queries_per_request",
+                              labels, timings.db_queries)
+
+        server_timing = [
+            f'db;dur={timings.db_time * 1000:.2f};desc="{timings.db_queries} queries"'
+        ]
+        for phase, duration in timings.phases.items():
+            if duration:
+                self.registry.observe("teamsync_phase_duration_seconds",
+                                      {**labels, "phase": phase}, duration)
+                server_timing.append(f"{phase};dur={duration * 1000:.2f}")
+        server_timing.append(f"total;dur={total * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(server_timing)
+
+        self._maybe_flush()
+        return response
+
+    def _worker_file(self):
+        # Имя выбирается в первом сбросе после fork, а не в init_app,
+        # который при preload выполняется в мастере
+        pid = os.getpid()
+        if self._worker_pid != pid:
+            self._worker_pid = pid
+            self._worker_name = f"worker_{pid}_{time.time_ns()}"
+        return self.directory / f"{self._worker_name}.json"
+
+    def _maybe_flush(self, force=False):
+        if self.directory is None:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        if not self._flush_lock.acquire(blocking=force):
+            return
+
+        try:
+            self._last_flush = now
+            path = self._worker_file()
+            temporary = path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(self.registry.snapshot()))
+            # Замена атомарна, /metrics не прочитает файл наполовину
+            os.replace(temporary, path)
+        finally:
+            self._flush_lock.release()
+
+    @contextmanager
+    def _directory_lock(self, exclusive):
+        """
+        Блокировка каталога между воркерами: перенос файла в сумму
+        эксклюзивный, иначе чтение увидело бы его и в сумме, и отдельно.
+        flock принадлежит открытому файлу, поэтому работает и между
+        потоками одного воркера
+        """
+        import fcntl
+
+        with open(self.directory / LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file,
+                        fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _fold_dead_workers(self):
+        """
+        Складывает файлы завершившихся воркеров в AGGREGATE_FILE
+        """
+        dead = [path for path in self.directory.glob("worker_*.json")
+                if not _is_alive(path)]
+        if not dead:
+            return
+
+        with self._directory_lock(exclusive=True):
+            aggregate_path = self.directory / AGGREGATE_FILE
+            snapshots = [_read_snapshot(aggregate_path)]
+            snapshots += [_read_snapshot(path) for path in dead]
+            temporary = aggregate_path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(merge_snapshots(snapshots)))
+            os.replace(temporary, aggregate_path)
+            for path in dead:
+                path.unlink(missing_ok=True)
+
+    def collect(self) -> dict:
+        if self.directory is None:
+            return self.registry.snapshot()
+
+        self._maybe_flush(force=True)
+        now = time.monotonic()
+        if now - self._last_fold >= FOLD_INTERVAL:
+            self._last_fold = now
+            self._fold_dead_workers()
+
+        with self._directory_lock(exclusive=False):
+            paths = [self.directory / AGGREGATE_FILE,
+                     *self.directory.glob("worker_*.json")]
+            return merge_snapshots(_read_snapshot(path) for path in paths)
+
+    def _metrics_view(self):
+        return Response(render_prometheus(self.collect()),
+                        content_type="text/plain; version=0.0.4")
+
+
+def _read_snapshot(path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_alive(path) -> bool:
+    """
+    Жив ли воркер файла worker_<pid>_<время старта>.json. Если pid уже
+    занят другим процессом, файл будет перенесен в сумму позже, пока
+    оба файла считаются отдельно
+    """
+    try:
+        pid = int(path.stem.split("_")[1])
+    except (IndexError, ValueError):
+        return True
+    if pid == os.getpid():
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def clear_worker_files(directory):
+    """
+    Удаляет файлы воркеров и сумму прошлого запуска, вызывается
+    мастером gunicorn
+    """
+    directory = Path(directory)
+    for path in [*directory.glob("worker_*.*"), *directory.glob("aggregate.*")]:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,51 @@
+from flask import request
+from pydantic import BaseModel
+from werkzeug.exceptions import BadRequest
+
+from games.schemas import GameSchemaRead
+from users.schemas import UserReadSchema
+
+
+class IncludedSchema(BaseModel):
+    """
+    Связанные объекты нормализованного ответа, каждый ровно один раз
+    """
+    users: list[UserReadSchema]
+    games: list[GameSchemaRead]
+
+
+def normalized_requested(fields=None) -> bool:
+    """
+    Запрошен ли нормализованный ответ (query параметр normalized=true):
+    строки списка содержат id связей, а сами связи лежат в included
+    """
+    if request.args.get("normalized") != "true":
+        return False
+    if fields:
+        raise BadRequest("fields and normalized can not be used together")
+    return True
+
+
+def ref_row(obj, schema, **values) -> dict:
+    """
+    Строка нормализованного списка: колонки объекта по полям схемы,
+    values задает поля которых нет среди атрибутов (например id участников)
+    """
+    return {
+        name: values[name] if name in values else getattr(obj, name)
+        for name in schema.model_fields
+    }
+
+
+def build_included(user_ids, game_ids) -> dict:
+    """
+    Пользователи и игры по множествам id, пользователи одним запросом,
+    игры из кеша каталога
+    """
+    from games.services import GameService
+    from users.services import UserService
+
+    return {
+        "users": UserService.get_rows_by_ids(user_ids),
+        "games": GameService.get_rows_by_ids(game_ids),
+    }
@@ -1,24 +1,23 @@
-from typing import Type, Dict, Optional
+from hashlib import sha256
+from threading import Lock
+from typing import TYPE_CHECKING, Type, Dict, Optional
 import re
 
-from flask import Flask
-from openapi_pydantic.v3.v3_0 import (
-    Info,
-    PathItem,
-    Operation,
-    Response,
-    Schema,
-    Components,
-    RequestBody,
-    Parameter,
-    OpenAPI, SecurityScheme,
-)
-from openapi_pydantic.v3.v3_0.util import (
-    PydanticSchema,
-    construct_open_api_with_schema_class
-)
+import click
+from flask import Flask, request, Response as FlaskResponse
 from typing_extensions import List
 
+if TYPE_CHECKING:
+    # openapi_pydantic нужен только для сборки спецификации, импортируется
+    # при первом обращении к документации, а не при старте воркера
+    from openapi_pydantic.v3.v3_0 import (
+        PathItem,
+        Response,
+        Schema,
+        RequestBody,
+        OpenAPI,
+    )
+
 from core.swagger_docs import SwaggerDocsExtension
 from logging import getLogger
 
@@ -37,12 +36,22 @@ class SwaggerDocsExtension:
 
 
 def generate_openapi_spec(app: Flask, title: str = "TeamSync API",
-                          version: str = "1.0.0") -> OpenAPI:
+                          version: str = "1.0.0") -> "OpenAPI":
     """
     Генерирует OpenAPI спецификацию с jwt на основе правил URL Flask и SwaggerDocsExtension.
     """
-    paths: Dict[str, PathItem] = {}
-    components_schemas: Dict[str, Schema] = {}
+    from openapi_pydantic.v3.v3_0 import (
+        Info,
+        PathItem,
+        Operation,
+        Components,
+        OpenAPI,
+        SecurityScheme,
+    )
+    from openapi_pydantic.v3.v3_0.util import construct_open_api_with_schema_class
+
+    paths: Dict[str, "PathItem"] = {}
+    components_schemas: Dict[str, "Schema"] = {}
     jwt_security_scheme = SecurityScheme(
         type="http",
         scheme="bearer",
@@ -110,29 +119,40 @@ def generate_openapi_spec(app: Flask, title: str = "TeamSync API",
 
 def _create_responses(
         responses: List[Dict[int, Type[BaseModel]]],
-        components_schemas: Dict[str, Schema]
-) -> Dict[str, Response]:
-    result = {}
+        components_schemas: Dict[str, "Schema"]
+) -> Dict[str, "Response"]:
+    from openapi_pydantic.v3.v3_0 import Response
+
+    refs = {}
 
     for response_dict in responses:
         for status_code, model in response_dict.items():
             schema_ref = _add_model_to_schemas(model, components_schemas)
-            result[str(status_code)] = Response(
-                description=f"",
-                content={
-                    "application/json": {
-                        "schema": schema_ref
-                    }
+            refs.setdefault(str(status_code), []).append(schema_ref)
+
+    result = {}
+    for status_code, schema_refs in refs.items():
+        # Несколько схем одного кода (например обычный и нормализованный
+        # список) описываются через oneOf
+        schema = schema_refs[0] if len(schema_refs) == 1 \
+            else {"oneOf": schema_refs}
+        result[status_code] = Response(
+            description=f"",
+            content={
+                "application/json": {
+                    "schema": schema
                 }
-            )
+            }
+        )
 
     return result
 
 
 def _create_request_body(
         model: Type[BaseModel],
-        components_schemas: Dict[str, Schema]
-) -> RequestBody:
+        components_schemas: Dict[str, "Schema"]
+) -> "RequestBody":
+    from openapi_pydantic.v3.v3_0 import RequestBody
 
     schema_ref = _add_model_to_schemas(model, components_schemas)
     return RequestBody(
@@ -147,8 +167,10 @@ def _create_request_body(
 
 def _add_model_to_schemas(
         model: Type[BaseModel],
-        components_schemas: Dict[str, Schema]
+        components_schemas: Dict[str, "Schema"]
 ) -> Dict[str, str]:
+    from openapi_pydantic.v3.v3_0.util import PydanticSchema
+
     model_name = model.__name__
     if model_name not in components_schemas:
         components_schemas[model_name] = PydanticSchema(schema_class=model)
@@ -174,6 +196,8 @@ def _extract_flask_route_params(url):
 
 
 def _get_path_params_obj_list(params):
+    from openapi_pydantic.v3.v3_0 import Parameter
+
     params_obj_list = []
     for param in params:
         params_obj_list.append(Parameter(name=param, param_in="path", required=True))
@@ -182,6 +206,8 @@ def _get_path_params_obj_list(params):
 
 
 def _get_query_params_obj_list(params):
+    from openapi_pydantic.v3.v3_0 import Parameter
+
     params_obj_list = []
     for param in params:
         params_obj_list.append(
@@ -190,13 +216,119 @@ def _get_query_params_obj_list(params):
     return params_obj_list
 
 
+class OpenAPISpecCache:
+    """
+    Собранная спецификация в виде готовых байт, генерируется один раз
+    при первом обращении (или заранее через build), ETag это хеш содержимого
+    """
+    def __init__(self, app: Flask):
+        self.app = app
+        self._lock = Lock()
+        self._body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+
+    def build(self):
+        body = generate_openapi_spec(self.app, "api").model_dump_json(
+            by_alias=True,
+            exclude_none=True,
+            indent=2
+        ).encode()
+        self._etag = sha256(body).hexdigest()[:32]
+        self._body = body
+
+    def get(self):
+        if self._body is None:
+            with self._lock:
+                if self._body is None:
+                    self.build()
+
+        return self._body, self._etag
+
+
 def register_openapi_spec_endpoint(app):
     """
-    Эндпоинт генерации swagger документации
+    Эндпоинт swagger документации и команда flask export-openapi
+    для выгрузки спецификации в файл
     """
+    spec_cache = OpenAPISpecCache(app)
+    app.extensions["openapi_spec"] = spec_cache
+
     @app.route('/api/docs/api_spec.json')
     def get_spec():
-
-        return generate_openapi_spec(app, "api").model_dump_json(by_alias=True,
-                                                                 exclude_none=True
-                                                                 , indent=2)
\ No newline at end of file
+        body, etag = spec_cache.get()
+
+        if request.if_none_match.contains_weak(etag):
+            response = FlaskResponse(status=304)
+        else:
+            response = FlaskResponse(body, content_type="application/json")
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    @app.cli.command("export-openapi")
+    @click.option("--output", "-o", type=click.Path(dir_okay=False),
+                  default="api_spec.json", show_default=True,
+                  help="Файл для записи спецификации")
+    def export_openapi(output):
+        """
+        Записывает OpenAPI спецификацию в файл для раздачи как статики
+        """
+        body, etag = spec_cache.get()
+        with open(output, "wb") as file:
+            file.write(body)
+        click.echo(f"OpenAPI spec written to {output} (ETag {etag})")
+
+class SwaggerUI:
+    """
+    Страница и статика Swagger UI. flasgger тянет jsonschema, yaml и
+    mistune, поэтому его приложение с UI создается при первом обращении
+    к документации, а не при старте воркера. Регистрировать blueprint в
+    основном приложении после первого запроса Flask не дает, поэтому
+    запросы UI выполняются в отдельном приложении, а спецификацию UI
+    загружает с основного
+    """
+    def __init__(self, config: dict):
+        self.config = config
+        self._lock = Lock()
+        self._app: Optional[Flask] = None
+
+    def get_app(self) -> Flask:
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    from flasgger import Swagger
+
+                    docs_app = Flask(__name__)
+                    docs_app.config["SWAGGER"] = self.config
+                    Swagger(docs_app)
+                    self._app = docs_app
+        return self._app
+
+    def dispatch(self):
+        docs_app = self.get_app()
+        with docs_app.request_context(request.environ):
+            return docs_app.full_dispatch_request()
+
+
+def register_swagger_ui(app):
+    """
+    Swagger UI на /api/docs/ поверх спецификации выше, flasgger
+    импортируется при первом открытии страницы. Без SWAGGER_UI
+    не импортируется совсем
+    """
+    if not app.config["SWAGGER_UI"]:
+        return
+
+    config = app.config["SWAGGER"]
+    swagger_ui = SwaggerUI(config)
+    app.extensions["swagger_ui"] = swagger_ui
+    static_url_path = config.get("static_url_path", "/flasgger_static")
+    rules = {
+        "swagger_ui": config["specs_route"],
+        "swagger_ui_oauth_redirect": "/oauth2-redirect.html",
+        "swagger_ui_static": f"{static_url_path}/<path:filename>",
+    }
+    for endpoint, rule in rules.items():
+        app.add_url_rule(rule, endpoint,
+                         lambda **kwargs: swagger_ui.dispatch())
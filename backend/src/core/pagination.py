@@ -0,0 +1,201 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Optional
+
+from flask import request
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.orm import Query
+from werkzeug.exceptions import BadRequest
+
+from extensions import db
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+@dataclass
+class PageParams:
+    """
+    Параметры keyset пагинации из query параметров limit и cursor
+    """
+    limit: int = DEFAULT_LIMIT
+    cursor: Optional[str] = None
+
+    @classmethod
+    def from_request_args(cls, args):
+        limit = args.get("limit")
+        if limit is None:
+            limit = DEFAULT_LIMIT
+        else:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise BadRequest("limit must be integer")
+
+            if not 1 <= limit <= MAX_LIMIT:
+                raise BadRequest(f"limit must be between 1 and {MAX_LIMIT}")
+
+        return cls(limit=limit, cursor=args.get("cursor") or None)
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: Optional[str] = None
+
+
+@dataclass
+class SortKey:
+    """
+    Колонка сортировки, последний ключ всегда должен быть уникальным (id),
+    чтобы порядок был стабильным
+    """
+    expression: Any
+    descending: bool = False
+
+    def ordering(self):
+        if self.descending:
+            return self.expression.desc()
+        return self.expression.asc()
+
+    def python_type(self):
+        """
+        Тип значения ключа в курсоре, None если тип колонки неизвестен
+        """
+        try:
+            return self.expression.type.python_type
+        except NotImplementedError:
+            return None
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, types) -> list:
+    """
+    Значения курсора с проверкой типов по ключам сортировки types (None -
+    любое число или строка). Подделанный курсор со значением другого типа
+    дал бы в сравнении с колонкой ошибку БД вместо 400
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(urlsafe_b64decode(cursor + padding))
+    except (BinasciiError, ValueError):
+        raise BadRequest("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise BadRequest("Invalid cursor")
+
+    for value, expected in zip(values, types):
+        if not _matches_type(value, expected):
+            raise BadRequest("Invalid cursor")
+
+    return values
+
+
+def _matches_type(value, expected):
+    # bool в json это true/false, но в python он подкласс int
+    if isinstance(value, bool):
+        return expected is bool
+    if expected is None:
+        return isinstance(value, (int, float, str))
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def _after_cursor(keys, values):
+    """
+    Условие "строго после курсора" для заданного порядка сортировки
+    """
+    directions = {key.descending for key in keys}
+    if len(directions) == 1:
+        # Сравнение кортежей использует составной индекс целиком
+        left = tuple_(*[key.expression for key in keys])
+        right = tuple_(*values)
+        return left < right if keys[0].descending else left > right
+
+    conditions = []
+    for i, key in enumerate(keys):
+        equal_prefix = [
+            prev.expression == value for prev, value in zip(keys[:i], values)
+        ]
+        if key.descending:
+            step = key.expression < values[i]
+        else:
+            step = key.expression > values[i]
+        conditions.append(and_(*equal_prefix, step))
+
+    return or_(*conditions)
+
+
+def paginate(query, keys, page: Optional[PageParams]) -> Page:
+    """
+    Keyset пагинация запроса, стоимость страницы не зависит от ее глубины
+    в отличии от OFFSET. Принимает как Query, так и select(), если page
+    не передан, то возвращает все строки в заданном порядке
+    """
+    keys = [key if isinstance(key, SortKey) else SortKey(key) for key in keys]
+    query = query.order_by(*[key.ordering() for key in keys])
+
+    if page is None:
+        return Page(items=_fetch(query))
+
+    if page.cursor is not None:
+        values = decode_cursor(page.cursor,
+                               [key.python_type() for key in keys])
+        query = query.filter(_after_cursor(keys, values))
+
+    query = query.add_columns(
+        *[key.expression.label(f"_cursor_{i}") for i, key in enumerate(keys)]
+    ).limit(page.limit + 1)
+
+    rows = _fetch(query)
+    has_next = len(rows) > page.limit
+    rows = rows[:page.limit]
+
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_cursor(rows[-1][-len(keys):])
+
+    return Page(
+        items=[_strip_cursor(row, len(keys)) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+def _fetch(query):
+    if isinstance(query, Query):
+        return query.all()
+    return db.session.execute(query).all()
+
+
+def _strip_cursor(row, keys_count):
+    values = row[:-keys_count]
+    if len(values) == 1:
+        return values[0]
+    return values
+
+
+def pagination(view):
+    """
+    Передает во вьюху параметры пагинации, если у нее есть
+    аргумент с типом PageParams
+    """
+    from core.binding import get_binding_plan
+
+    arg_name = get_binding_plan(view).page_arg
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if arg_name is not None:
+            kwargs[arg_name] = PageParams.from_request_args(request.args)
+
+        return view(*args, **kwargs)
+
+    return wrapper
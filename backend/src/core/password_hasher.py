@@ -0,0 +1,87 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+
+from werkzeug.exceptions import TooManyRequests
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasher:
+    """
+    Хеширование паролей в отдельном пуле процессов, чтобы pbkdf2 не занимал
+    воркер gunicorn. Одновременно выполняется не больше MAX_CONCURRENCY
+    задач на воркер, остальные ждут свободного места QUEUE_TIMEOUT секунд,
+    после чего получают 429. При POOL_SIZE = 0 хеширование идет в текущем
+    процессе (dev режим)
+    """
+    def __init__(self):
+        self.method = "pbkdf2:sha256"
+        self.pool_size = 0
+        self.queue_timeout = 0.0
+        self._slots = BoundedSemaphore(1)
+        self._lock = Lock()
+        self._executor = None
+        self._hash_prefix = None
+        os.register_at_fork(after_in_child=self._forget_executor)
+
+    def init_app(self, app):
+        config = app.config["PASSWORD_HASHING"]
+        self.method = config["METHOD"]
+        self._hash_prefix = None
+        self.pool_size = config["POOL_SIZE"]
+        self.queue_timeout = config["QUEUE_TIMEOUT"]
+        self._slots = BoundedSemaphore(config["MAX_CONCURRENCY"])
+        app.extensions["password_hasher"] = self
+
+    def _forget_executor(self):
+        # Процессы пула принадлежат родителю, в дочернем создаем свой
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.pool_size,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise TooManyRequests(
+                "Too many authentication requests, try again later",
+                retry_after=max(1, math.ceil(self.queue_timeout)),
+            )
+
+        try:
+            if self.pool_size == 0:
+                return func(*args)
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """
+        Хеш создан с другими параметрами (алгоритм или число итераций)
+        """
+        return password_hash.split("$", 1)[0] != self._get_hash_prefix()
+
+    def _get_hash_prefix(self):
+        """
+        Префикс хеша текущего метода со всеми параметрами, которые
+        werkzeug дописывает сам (scrypt:32768:8:1, pbkdf2:sha256:1000000).
+        Вычисляется один раз при первой проверке, а не в init_app, чтобы
+        хеш не замедлял старт воркера
+        """
+        if self._hash_prefix is None:
+            self._hash_prefix = self.hash("").split("$", 1)[0]
+        return self._hash_prefix
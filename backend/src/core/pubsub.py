@@ -0,0 +1,157 @@
+import json
+import os
+import select
+import time
+from collections import defaultdict
+from logging import getLogger
+from threading import Lock, Thread
+
+logger = getLogger(__name__)
+
+
+class Broker:
+    """
+    Канал рассылки сообщений между воркерами, сообщения это
+    json-сериализуемые словари
+    """
+    def publish(self, channel: str, message: dict):
+        raise NotImplementedError
+
+    def subscribe(self, channel: str, callback):
+        raise NotImplementedError
+
+    def ensure_started(self):
+        """
+        Вызывается перед каждым запросом, брокеры с фоновым
+        слушателем запускают его здесь (уже после fork воркера)
+        """
+
+
+class InProcessBroker(Broker):
+    """
+    Брокер внутри одного процесса, используется в dev режиме и тестах
+    как локальная замена межпроцессного брокера
+    """
+    def __init__(self):
+        self._callbacks = defaultdict(list)
+
+    def publish(self, channel, message):
+        for callback in list(self._callbacks[channel]):
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Pubsub callback failed on %s", channel)
+
+    def subscribe(self, channel, callback):
+        self._callbacks[channel].append(callback)
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Брокер поверх LISTEN/NOTIFY PostgreSQL, доставляет сообщения во все
+    воркеры всех хостов подключенных к базе. Слушатель работает в фоновом
+    потоке со своим соединением и запускается лениво в каждом воркере
+    """
+    def __init__(self, dsn: str, poll_interval: float = 1.0):
+        super().__init__()
+        self.dsn = dsn
+        self.poll_interval = poll_interval
+        self._lock = Lock()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # После fork потоки и соединения родителя недоступны,
+        # закрывать чужие сокеты нельзя, поэтому просто забываем их
+        self._listener = None
+        self._publisher = None
+
+    def _connect(self):
+        import psycopg2
+
+        connection = psycopg2.connect(self.dsn)
+        connection.autocommit = True
+        return connection
+
+    def publish(self, channel, message):
+        payload = json.dumps(message)
+        with self._lock:
+            try:
+                if self._publisher is None or self._publisher.closed:
+                    self._publisher = self._connect()
+                with self._publisher.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)",
+                                   (channel, payload))
+            except Exception:
+                self._publisher = None
+                logger.exception("Pubsub publish failed on %s", channel)
+
+    def ensure_started(self):
+        if self._listener is not None:
+            return
+
+        with self._lock:
+            if self._listener is None:
+                self._listener = Thread(
+                    target=self._listen_forever,
+                    name="pubsub-listener",
+                    daemon=True,
+                )
+                self._listener.start()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Pubsub listener failed, reconnecting")
+                time.sleep(self.poll_interval)
+
+    def _listen(self):
+        connection = self._connect()
+        listening = set()
+        try:
+            while True:
+                with connection.cursor() as cursor:
+                    for channel in set(self._callbacks) - listening:
+                        cursor.execute(f'LISTEN "{channel}"')
+                        listening.add(channel)
+
+                ready, _, _ = select.select([connection], [], [],
+                                            self.poll_interval)
+                if not ready:
+                    continue
+
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    super().publish(notify.channel, json.loads(notify.payload))
+        finally:
+            connection.close()
+
+
+class PubSub:
+    """
+    Расширение Flask выбирающее брокер по конфигу PUBSUB["BACKEND"]:
+    memory (по умолчанию) или postgres
+    """
+    def __init__(self):
+        self.broker: Broker = InProcessBroker()
+
+    def init_app(self, app):
+        backend = app.config["PUBSUB"]["BACKEND"]
+        if backend == "postgres":
+            self.broker = PostgresBroker(app.config["SQLALCHEMY_DATABASE_URI"])
+        elif backend == "memory":
+            self.broker = InProcessBroker()
+        else:
+            raise ValueError(f"Unknown pubsub backend {backend}")
+
+        app.before_request(self.broker.ensure_started)
+        app.extensions["pubsub"] = self
+
+    def publish(self, channel: str, message: dict):
+        self.broker.publish(channel, message)
+
+    def subscribe(self, channel: str, callback):
+        self.broker.subscribe(channel, callback)
@@ -2,13 +2,17 @@ import json
 from functools import wraps
 
 from pydantic import BaseModel, ValidationError
+from pydantic_core import to_json
 from flask import request, Response
 from werkzeug.exceptions import BadRequest
 
-from core.utils import get_func_instance_arg
+from core.binding import get_binding_plan
+from core.metrics import request_timer
 
 
 def pydantic_validation(view):
+    plan = get_binding_plan(view)
+
     def default_serializer(obj):
         if isinstance(obj, (ValueError, Exception)):
             return str(obj)  # Преобразуем исключение в строку
@@ -43,9 +47,9 @@ def pydantic_validation(view):
         if isinstance(object_content, Response):
             return object_content
         elif isinstance(object_content, dict):
-            content = object_content
+            content = to_json(object_content)
         elif issubclass(type(object_content), BaseModel):
-            content = object_content.model_dump_json()
+            content = plan.serialize(object_content)
         else:
             content = {}
 
@@ -58,21 +62,20 @@ def pydantic_validation(view):
 
     @wraps(view)
     def wrapper(*args, **kwargs):
+        if plan.body_schema is not None:
+            with request_timer("validation"):
+                try:
+                    json_data = request.get_json()
+                except BadRequest:
+                    raise BadRequest("JSON parse error, data is not valid JSON")
 
-        pydantic_schema, arg_name = get_func_instance_arg(view, BaseModel)
-        if pydantic_schema is not None:
-            try:
-                json_data = request.get_json()
-            except BadRequest:
-                raise BadRequest("JSON parse error, data is not valid JSON")
-
-            item = validate_request_body(json_data, pydantic_schema)
-
-            kwargs[arg_name] = item
+                item = validate_request_body(json_data, plan.body_schema)
 
-        return get_response_object(view(*args, **kwargs))
+            kwargs[plan.body_arg] = item
 
-    pydantic_schema, _ = get_func_instance_arg(view, BaseModel)
+        view_res = view(*args, **kwargs)
+        with request_timer("serialization"):
+            return get_response_object(view_res)
 
-    wrapper.pydantic_schema = pydantic_schema
+    wrapper.pydantic_schema = plan.body_schema
     return wrapper
@@ -0,0 +1,256 @@
+import ipaddress
+import math
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from hashlib import blake2b
+from threading import Lock
+from typing import Callable, Optional
+
+from flask import current_app, request
+from werkzeug.exceptions import TooManyRequests
+
+KEY_KINDS = ("ip", "user", "endpoint")
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Лимит limit запросов за period секунд на ключ key:
+    ip - адрес клиента, user - авторизованный пользователь (для анонимных
+    запросов адрес), endpoint - общий для всех клиентов.
+    burst - емкость ведра, по умолчанию limit. when - условие при котором
+    лимит применяется, например только к запросам с поиском
+    """
+    limit: int
+    period: float
+    key: str = "ip"
+    burst: Optional[int] = None
+    when: Optional[Callable[[], bool]] = None
+
+    def __post_init__(self):
+        if self.key not in KEY_KINDS:
+            raise ValueError(f"Unknown rate limit key {self.key!r}, "
+                             f"expected one of {KEY_KINDS}")
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+    @property
+    def capacity(self) -> int:
+        return self.burst or self.limit
+
+
+class MemoryBackend:
+    """
+    Ведра в словаре процесса, в dev режиме и тестах. Под gunicorn у
+    каждого воркера свои ведра и фактический лимит умножается на число
+    воркеров
+    """
+    def __init__(self, max_keys: int = 65536):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def consume(self, key: str, rate: float, capacity: int, now: float) -> float:
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, retry_after = _take(tokens, updated, rate, capacity, now)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class SharedMemoryBackend:
+    """
+    Ведра в файле отображенном в память (mmap), общем для всех воркеров
+    хоста. Файл разбит на группы по GROUP_SIZE слотов, слот это хеш
+    ключа, число токенов и время обновления. Ключ попадает в группу по
+    хешу, при заполненной группе вытесняется слот обновлявшийся раньше
+    всех (его ведро скорее всего уже полное). На время операции группа
+    блокируется fcntl по диапазону байт, внутри процесса еще и Lock,
+    потому что блокировки fcntl принадлежат процессу, а не потоку
+    """
+    SLOT = struct.Struct("<Qdd")
+    GROUP_SIZE = 8
+
+    def __init__(self, path: str, slots: int = 65536):
+        self.path = path
+        self.groups = max(1, slots // self.GROUP_SIZE)
+        self.group_bytes = self.SLOT.size * self.GROUP_SIZE
+        self._lock = Lock()
+
+        size = self.groups * self.group_bytes
+        # fcntl есть только на POSIX, memory бэкенд работает и на Windows
+        import fcntl
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._fcntl = fcntl
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != size:
+                # Другое число слотов, старое содержимое не читается
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+
+    def consume(self, key: str, rate: float, capacity: int, now: float) -> float:
+        key_hash = int.from_bytes(
+            blake2b(key.encode(), digest_size=8).digest(), "little"
+        ) or 1
+        group = key_hash % self.groups
+        offset = group * self.group_bytes
+        slot_struct = self.SLOT
+
+        with self._lock:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX,
+                              self.group_bytes, offset, os.SEEK_SET)
+            try:
+                target, oldest = None, None
+                for slot in range(self.GROUP_SIZE):
+                    position = offset + slot * slot_struct.size
+                    slot_hash, tokens, updated = slot_struct.unpack_from(
+                        self._map, position
+                    )
+                    if slot_hash == key_hash:
+                        target = (position, tokens, updated)
+                        break
+                    if oldest is None or updated < oldest[2]:
+                        oldest = (position, capacity, updated)
+
+                if target is None:
+                    # Новый ключ получает полное ведро в самом старом слоте
+                    position, tokens, updated = oldest[0], capacity, now
+                else:
+                    position, tokens, updated = target
+
+                tokens, retry_after = _take(tokens, updated, rate,
+                                            capacity, now)
+                slot_struct.pack_into(self._map, position, key_hash, tokens, now)
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN,
+                                  self.group_bytes, offset, os.SEEK_SET)
+        return retry_after
+
+
+def _take(tokens, updated, rate, capacity, now):
+    """
+    Пополняет ведро за прошедшее время и забирает токен, если он есть.
+    Возвращает остаток токенов и секунды до следующего токена (0 - запрос
+    разрешен)
+    """
+    # Часы могли уйти назад, отрицательное пополнение не считаем
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class RateLimiter:
+    """
+    Расширение Flask выбирающее хранилище ведер по конфигу
+    RATE_LIMIT["BACKEND"]: memory - в пределах процесса,
+    shared - файл в памяти общий для воркеров хоста
+    """
+    def __init__(self):
+        self.enabled = True
+        self.ip_header = None
+        self.trusted_proxies = ()
+        self._backend = MemoryBackend()
+
+    def init_app(self, app):
+        config = app.config["RATE_LIMIT"]
+        self.enabled = config["ENABLED"]
+        self.ip_header = config["IP_HEADER"] or None
+        self.trusted_proxies = tuple(
+            ipaddress.ip_network(network) for network in config["TRUSTED_PROXIES"]
+        )
+
+        backend = config["BACKEND"]
+        if backend == "memory":
+            self._backend = MemoryBackend(config["SLOTS"])
+        elif backend == "shared":
+            self._backend = SharedMemoryBackend(config["PATH"], config["SLOTS"])
+        else:
+            raise ValueError(f"Unknown rate limit backend: {backend}")
+        app.extensions["rate_limiter"] = self
+
+    def client_ip(self) -> str:
+        remote_addr = request.remote_addr or "-"
+        if self.ip_header and self._is_trusted_proxy(remote_addr):
+            # Заголовок выставляет nginx, от остальных адресов он может
+            # быть подделан, чтобы уйти от лимита или исчерпать чужой
+            forwarded = request.headers.get(self.ip_header)
+            if forwarded:
+                return forwarded
+        return remote_addr
+
+    def _is_trusted_proxy(self, address: str) -> bool:
+        try:
+            address = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    def check(self, limit: RateLimit, index: int, user=None):
+        """
+        Забирает токен из ведра лимита для текущего запроса,
+        при пустом ведре выбрасывает 429 с Retry-After
+        """
+        if limit.key == "endpoint":
+            subject = "*"
+        elif limit.key == "user" and user is not None:
+            subject = f"u{user.id}"
+        else:
+            subject = f"ip{self.client_ip()}"
+
+        key = f"{request.endpoint}:{index}:{subject}"
+        retry_after = self._backend.consume(key, limit.rate, limit.capacity,
+                                            time.time())
+        if retry_after:
+            raise TooManyRequests(
+                "Rate limit exceeded, try again later",
+                retry_after=max(1, math.ceil(retry_after)),
+            )
+
+
+def rate_limited(limits):
+    """
+    Применяет лимиты RateLimit к вьюхе, стоит после jwt_auth, чтобы
+    лимит по пользователю видел авторизованного пользователя
+    """
+    if isinstance(limits, RateLimit):
+        limits = [limits]
+    limits = list(limits or [])
+
+    def decorator(view):
+        # core.binding тянет extensions, а RateLimiter импортируется из них
+        from core.binding import get_binding_plan
+
+        if not limits:
+            return view
+
+        user_arg = get_binding_plan(view).user_arg
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get("rate_limiter")
+            if limiter is not None and limiter.enabled:
+                user = kwargs.get(user_arg) if user_arg else None
+                for index, limit in enumerate(limits):
+                    if limit.when is None or limit.when():
+                        limiter.check(limit, index, user)
+
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
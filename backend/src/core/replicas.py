@@ -0,0 +1,189 @@
+import random
+import time
+from functools import wraps
+from threading import Lock
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from flask_sqlalchemy.session import Session
+from jwt.exceptions import PyJWTError
+
+STICKY_COOKIE = "db_primary_until"
+STICKY_CHANNEL = "replica_sticky"
+REPLICA_BIND_PREFIX = "replica_"
+
+
+class RoutingSession(Session):
+    """
+    Сессия отправляющая чтения на реплики: запросы GET вьюх и сервисных
+    методов помеченных read_only. Запись, SELECT ... FOR UPDATE и все
+    запросы после первой записи в сессии идут в основную БД. Без реплик
+    в конфиге ведет себя как обычная сессия
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._is_write(clause):
+                self.info["wrote"] = True
+            elif self._replica_allowed():
+                replica = self._replica()
+                if replica is not None:
+                    return replica
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind,
+                                **kwargs)
+
+    def _is_write(self, clause):
+        if self._flushing:
+            return True
+        if clause is None:
+            return False
+        return (
+            getattr(clause, "is_dml", False)
+            or getattr(clause, "_for_update_arg", None) is not None
+        )
+
+    def _replica_allowed(self):
+        if self.info.get("wrote"):
+            return False
+        if has_request_context():
+            if current_app.extensions["replica_routing"].is_sticky():
+                return False
+            if request.method in ("GET", "HEAD"):
+                return True
+        return self.info.get("read_only", False)
+
+    def _replica(self):
+        # Одна реплика на всю сессию, чтобы чтения внутри запроса
+        # видели одинаковый снимок
+        if "replica" not in self.info:
+            replicas = [
+                engine for key, engine in self._db.engines.items()
+                if key is not None and key.startswith(REPLICA_BIND_PREFIX)
+            ]
+            self.info["replica"] = random.choice(replicas) if replicas else None
+        return self.info["replica"]
+
+
+def _cookie_sticky():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _request_identity():
+    """
+    Пользователь из JWT запроса, None без токена или с невалидным токеном
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except (PyJWTError, JWTExtendedException):
+        return None
+
+
+def read_only(method):
+    """
+    Помечает сервисный метод только читающим, его запросы идут на реплику
+    в любом контексте (CLI, POST вьюха), если в сессии еще не было записи
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        from extensions import db
+
+        session = db.session()
+        previous = session.info.get("read_only", False)
+        session.info["read_only"] = True
+        try:
+            return method(*args, **kwargs)
+        finally:
+            session.info["read_only"] = previous
+
+    return wrapper
+
+
+class ReplicaRouting:
+    """
+    Read-your-writes: после запроса с записью в течение STICKY_SECONDS
+    чтения того же пользователя идут в основную БД, пока реплики догоняют
+    изменения. Пользователь определяется по JWT, время хранится на сервере
+    и рассылается остальным воркерам через pubsub, так что клиентам API
+    без cookie тоже не нужно ничего хранить. Для запросов без токена
+    остается cookie
+    """
+    MAX_USERS = 100000
+
+    def __init__(self):
+        self.sticky_seconds = 0.0
+        self._until = {}
+        self._lock = Lock()
+        self._pubsub = None
+
+    def init_app(self, app, db, pubsub):
+        self.sticky_seconds = app.config["DATABASE"]["REPLICA_STICKY_SECONDS"]
+        self._db = db
+        if app.config.get("SQLALCHEMY_BINDS"):
+            self._pubsub = pubsub
+            pubsub.subscribe(STICKY_CHANNEL, self._on_sticky_message)
+            app.after_request(self.mark_sticky)
+        app.extensions["replica_routing"] = self
+
+    def is_sticky(self) -> bool:
+        """
+        Читает ли текущий запрос из основной БД, результат запоминается
+        на запрос, get_bind вызывается на каждый SQL запрос
+        """
+        sticky = g.get("replica_sticky")
+        if sticky is None:
+            sticky = _cookie_sticky() or self._identity_sticky()
+            g.replica_sticky = sticky
+        return sticky
+
+    def _identity_sticky(self):
+        if not self._until:
+            # Недавних записей нет, токен можно не разбирать
+            return False
+        until = self._until.get(_request_identity())
+        return until is not None and until > time.time()
+
+    def _remember(self, identity, until):
+        with self._lock:
+            self._until[identity] = max(until, self._until.get(identity, 0))
+            if len(self._until) > self.MAX_USERS:
+                now = time.time()
+                self._until = {
+                    key: value for key, value in self._until.items()
+                    if value > now
+                }
+
+    def bind_identity(self, identity):
+        """
+        Пользователь, которому привязывается запись анонимного запроса,
+        например регистрация, после которой клиент сразу ходит с токеном
+        """
+        g.sticky_identity = identity
+
+    def _on_sticky_message(self, message):
+        self._remember(message["identity"], message["until"])
+
+    def mark_sticky(self, response):
+        registry = self._db.session.registry
+        if not registry.has() or not registry().info.get("wrote"):
+            return response
+
+        until = time.time() + self.sticky_seconds
+        identity = g.get("sticky_identity") or _request_identity()
+        if identity is not None:
+            self._remember(identity, until)
+            self._pubsub.publish(STICKY_CHANNEL,
+                                 {"identity": identity, "until": until})
+
+        response.set_cookie(
+            STICKY_COOKIE,
+            str(until),
+            max_age=max(1, int(self.sticky_seconds)),
+            httponly=True,
+            samesite="Lax",
+        )
+        return response
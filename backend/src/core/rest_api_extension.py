@@ -1,9 +1,14 @@
 from functools import wraps
-from typing import Optional, List, Dict, Type, Any
+from typing import Optional, List, Dict, Type, Any, Union
 
 from pydantic import BaseModel
 from core.exception_catcher import exception_catcher
 from core.jwt_auth import jwt_auth
+from core.binding import compile_binding_plan
+from core.conditional_get import conditional_get
+from core.fieldsets import field_selection
+from core.pagination import pagination
+from core.rate_limit import RateLimit, rate_limited
 from core.swagger_docs import swagger_docs
 from core.pydantic_validation import pydantic_validation
 
@@ -14,16 +19,33 @@ def rest_api(
     responses: Optional[List[Dict[int, Type[BaseModel]]]] = None,
     description: Optional[str] = None,
     query_params: Optional[List[str]] = None,
+    etag_resources: Optional[List[str]] = None,
+    rate_limit: Optional[Union[RateLimit, List[RateLimit]]] = None,
 ):
     def decorator(view):
         original_sig = inspect.signature(view)
         original_annotations = view.__annotations__
 
+        # План связывания аргументов составляется один раз здесь,
+        # а обертки ниже только исполняют его на каждом запросе
+        plan = compile_binding_plan(view, responses)
+        view._binding_plan = plan
+
+        docs_query_params = list(query_params or [])
+        if plan.page_arg is not None:
+            docs_query_params += ["limit", "cursor"]
+        if plan.fields_arg is not None:
+            docs_query_params.append("fields")
+
         wrapped = view
         wrapped = pydantic_validation(wrapped)
+        wrapped = pagination(wrapped)
+        wrapped = field_selection(wrapped)
+        wrapped = conditional_get(etag_resources)(wrapped)
+        wrapped = rate_limited(rate_limit)(wrapped)
         wrapped = jwt_auth(wrapped)
         wrapped = exception_catcher(wrapped)
-        wrapped = swagger_docs(description=description, responses=responses, query_params=query_params)(wrapped)
+        wrapped = swagger_docs(description=description, responses=responses, query_params=docs_query_params)(wrapped)
 
         wrapped.__signature__ = original_sig
         wrapped.__annotations__ = original_annotations
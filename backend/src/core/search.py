@@ -0,0 +1,73 @@
+from dataclasses import dataclass, field
+
+from sqlalchemy import Float, and_, cast, func, literal
+
+from core.pagination import SortKey
+from extensions import db
+
+
+def escape_like(term: str) -> str:
+    return (
+        term.replace("\\", "\\\\")
+        .replace("%", "\\%")
+        .replace("_", "\\_")
+    )
+
+
+def _dialect_name():
+    return db.session.get_bind().dialect.name
+
+
+def similarity(column, term: str):
+    """
+    Оценка похожести строки на запрос, на PostgreSQL это similarity() из
+    pg_trgm, на остальных БД (SQLite в тестах) приближение по тому какую
+    долю строки занимает запрос. Приводится к double precision, чтобы
+    значение без потерь проходило через курсор пагинации
+    """
+    if _dialect_name() == "postgresql":
+        return cast(func.similarity(column, term), Float)
+
+    return literal(float(len(term)), Float) / func.max(func.length(column), 1)
+
+
+@dataclass
+class SubstringSearch:
+    """
+    Регистронезависимый поиск подстроки по нескольким колонкам.
+    На PostgreSQL ILIKE '%...%' обслуживается GIN индексом gin_trgm_ops,
+    а результаты сортируются по суммарной похожести
+    """
+    conditions: list = field(default_factory=list)
+    ranks: list = field(default_factory=list)
+
+    def add(self, column, term):
+        if not term:
+            return self
+
+        pattern = f"%{escape_like(term)}%"
+        self.conditions.append(column.ilike(pattern, escape="\\"))
+        self.ranks.append(similarity(column, term))
+        return self
+
+    def __bool__(self):
+        return bool(self.conditions)
+
+    def apply(self, query):
+        if not self:
+            return query
+        return query.filter(and_(*self.conditions))
+
+    def sort_keys(self, id_column):
+        """
+        Ключи сортировки для paginate, без поиска сортируем по id
+        """
+        if not self:
+            return [id_column]
+
+        rank = self.ranks[0]
+        for other in self.ranks[1:]:
+            rank = rank + other
+
+        return [SortKey(rank, descending=True),
+                SortKey(id_column, descending=True)]
@@ -0,0 +1,131 @@
+import json
+import queue
+from threading import Lock
+
+from flask import Response
+from werkzeug.exceptions import ServiceUnavailable
+
+HEARTBEAT_INTERVAL = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, channel, predicate):
+        self.channel = channel
+        self.predicate = predicate
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event):
+        if self.predicate is not None and not self.predicate(event["data"]):
+            return
+
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Медленный клиент, закрываем поток чтобы он переподключился
+            self.overflowed = True
+
+
+class EventStreams:
+    """
+    Server-Sent Events поверх pubsub: события публикуются в брокер, а
+    каждый воркер раздает их своим подключенным клиентам. Под gthread
+    открытый поток занимает поток воркера, поэтому их число на воркер
+    ограничено MAX_STREAMS, а в production потоки обслуживает отдельный
+    сервис с большим числом потоков (см. gunicorn.conf.py)
+    """
+    def __init__(self):
+        self._pubsub = None
+        self._subscriptions = {}
+        self._lock = Lock()
+        self._open_streams = 0
+        self.max_streams = 100
+        self.retry_after = 10
+
+    def init_app(self, app, pubsub):
+        self._pubsub = pubsub
+        self.max_streams = app.config["EVENT_STREAMS"]["MAX_STREAMS"]
+        self.retry_after = app.config["EVENT_STREAMS"]["RETRY_AFTER"]
+        app.extensions["event_streams"] = self
+
+    def _channel_name(self, channel):
+        return f"events_{channel}"
+
+    def publish(self, channel: str, event_type: str, data: dict):
+        self._pubsub.publish(
+            self._channel_name(channel), {"type": event_type, "data": data}
+        )
+
+    def _dispatch(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions[channel])
+        for subscription in subscriptions:
+            subscription.offer(event)
+
+    def subscribe(self, channel: str, predicate=None) -> Subscription:
+        """
+        Подписка на канал, при исчерпанном лимите потоков воркера
+        ServiceUnavailable с Retry-After
+        """
+        subscription = Subscription(channel, predicate)
+        with self._lock:
+            if self._open_streams >= self.max_streams:
+                raise ServiceUnavailable(
+                    "Too many open event streams, retry later",
+                    retry_after=self.retry_after,
+                )
+            self._open_streams += 1
+            if channel not in self._subscriptions:
+                self._subscriptions[channel] = set()
+                self._pubsub.subscribe(
+                    self._channel_name(channel),
+                    lambda event: self._dispatch(channel, event),
+                )
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions[subscription.channel]
+            if subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._open_streams -= 1
+
+    def response(self, subscription: Subscription,
+                 stop_event_types=()) -> Response:
+        """
+        Потоковый ответ text/event-stream для подписки, heartbeat
+        комментарии не дают прокси закрыть простаивающее соединение.
+        Генератор не использует контекст запроса, поэтому сессия БД
+        закрывается сразу после вьюхи, а не держит соединение весь поток
+        """
+        def generate():
+            yield ": connected\n\n"
+            while not subscription.overflowed:
+                try:
+                    event = subscription.queue.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                payload = json.dumps(event["data"], default=str)
+                yield f"event: {event['type']}\ndata: {payload}\n\n"
+
+                if event["type"] in stop_event_types:
+                    break
+
+        # close() ответа вызывается и для генератора, который так и не
+        # начал выполняться (клиент отключился раньше), finally внутри
+        # генератора в этом случае не сработал бы и поток остался бы в лимите
+        response = Response(
+            generate(),
+            content_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                # nginx не должен буферизовать поток
+                "X-Accel-Buffering": "no",
+            },
+        )
+        response.call_on_close(lambda: self.unsubscribe(subscription))
+        return response
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+from bids.schemas import BidListSchema
+from lobbies.schemas import LobbyListSchema
+from users.schemas import UserReadSchema
+
+
+class DashboardSchema(BaseModel):
+    profile: UserReadSchema
+    my_lobbies: LobbyListSchema
+    open_lobbies: LobbyListSchema
+    bids: BidListSchema
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from extensions import db
+from bids.models import Bid
+from bids.services import BidService
+from core.pagination import PageParams
+from lobbies.models import Lobby, users as lobby_users
+from lobbies.services import LobbyService
+from users.models import User
+
+
+class DashboardService:
+    @staticmethod
+    def get(user: User, limit: int):
+        """
+        Первые страницы "моих" лобби, открытых лобби и заявок. Списки
+        грузятся без связей с пользователями, затем участники и авторы всех
+        списков подгружаются пачкой, игры берутся из join тех же запросов.
+        Итого не больше 5 запросов на весь дашборд
+        """
+        my_lobbies = LobbyService.get_authors_list(
+            user, PageParams(limit=limit), options=(joinedload(Lobby.game),)
+        )
+        open_lobbies = LobbyService.get_list(
+            open_slots=True,
+            page=PageParams(limit=limit),
+            options=(contains_eager(Lobby.game),),
+        )
+        bids = BidService.get_all(
+            page=PageParams(limit=limit), options=(contains_eager(Bid.game),)
+        )
+
+        lobbies = {lobby.id: lobby for lobby in my_lobbies.items}
+        lobbies.update((lobby.id, lobby) for lobby in open_lobbies.items)
+        users = DashboardService._load_members(lobbies)
+        users[user.id] = user
+        DashboardService._load_authors(
+            list(lobbies.values()) + bids.items, users
+        )
+
+        return {
+            "profile": user,
+            "my_lobbies": {
+                "lobbies": my_lobbies.items,
+                "next_cursor": my_lobbies.next_cursor,
+            },
+            "open_lobbies": {
+                "lobbies": open_lobbies.items,
+                "next_cursor": open_lobbies.next_cursor,
+            },
+            "bids": {"bids": bids.items, "next_cursor": bids.next_cursor},
+        }
+
+    @staticmethod
+    def _load_members(lobbies: dict) -> dict:
+        """
+        Участники всех лобби одним запросом, возвращает загруженных
+        пользователей по id
+        """
+        members = defaultdict(list)
+        users = {}
+        if lobbies:
+            rows = db.session.execute(
+                select(lobby_users.c.lobby_id, User)
+                .join(lobby_users, lobby_users.c.user_id == User.id)
+                .where(lobby_users.c.lobby_id.in_(lobbies))
+            )
+            for lobby_id, member in rows:
+                members[lobby_id].append(member)
+                users[member.id] = member
+
+        for lobby_id, lobby in lobbies.items():
+            set_committed_value(lobby, "members", members[lobby_id])
+        return users
+
+    @staticmethod
+    def _load_authors(items, users: dict):
+        """
+        Авторы которых еще нет среди загруженных пользователей
+        догружаются одним запросом. У лобби author_id может быть NULL,
+        тогда автор None
+        """
+        missing = {
+            item.author_id for item in items if item.author_id is not None
+        } - users.keys()
+        if missing:
+            for author in db.session.scalars(
+                select(User).where(User.id.in_(missing))
+            ):
+                users[author.id] = author
+
+        for item in items:
+            set_committed_value(item, "author", users.get(item.author_id))
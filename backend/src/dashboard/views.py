@@ -0,0 +1,31 @@
+from flask import Blueprint, request
+from werkzeug.exceptions import BadRequest
+
+from core.rest_api_extension import rest_api
+from dashboard.schemas import DashboardSchema
+from dashboard.services import DashboardService
+from users.models import User
+
+dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/api/dashboard")
+
+DEFAULT_SECTION_LIMIT = 10
+MAX_SECTION_LIMIT = 50
+
+
+@dashboard_bp.route("", methods=["GET"])
+@rest_api(
+    description="Данные главной страницы одним запросом: профиль, свои"
+                " лобби, открытые лобби и заявки. limit ограничивает каждый"
+                " список, следующие страницы запрашиваются через next_cursor"
+                " в соответствующих эндпоинтах",
+    responses=[{200: DashboardSchema}],
+    query_params=["limit"],
+    etag_resources=["lobbies", "bids", "games", "users"],
+)
+def get_dashboard(user: User):
+    limit = request.args.get("limit", DEFAULT_SECTION_LIMIT, type=int)
+    if not 1 <= limit <= MAX_SECTION_LIMIT:
+        raise BadRequest(f"limit must be between 1 and {MAX_SECTION_LIMIT}")
+
+    dashboard = DashboardService.get(user, limit)
+    return DashboardSchema.model_validate(dashboard, from_attributes=True)
@@ -0,0 +1,160 @@
+import json
+
+import click
+from sqlalchemy import UniqueConstraint, event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import with_parent
+
+from extensions import db
+
+
+def _index_checks():
+    """
+    Запросы сервисов и ожидаемый индекс для каждого. Сервисные методы
+    вызываются как есть, проверяется первый выполненный ими SQL
+    """
+    from bids.models import Bid
+    from core.pagination import PageParams
+    from games.models import Game
+    from lobbies.models import users as lobby_users
+    from lobbies.schemas import LobbyQuickJoinSchema
+    from lobbies.services import LobbyService
+    from users.models import User
+
+    user, game = User(id=1), Game(id=1)
+    page = PageParams(limit=20)
+    quick_join = LobbyQuickJoinSchema(game_id=1, platform="pc",
+                                      min_skill=2, max_skill=6)
+
+    def run(statement):
+        return lambda: db.session.execute(statement).all()
+
+    return [
+        ("LobbyService.get_list(open_slots)",
+         lambda: LobbyService.get_list(open_slots=True, page=page),
+         "ix_lobbies_open_id"),
+        ("LobbyService.get_list(platform, skill)",
+         lambda: LobbyService.get_list(platform="pc", min_skill=2,
+                                       max_skill=6, page=page),
+         "ix_lobbies_platform_skill_level"),
+        ("LobbyService.get_authors_list",
+         lambda: LobbyService.get_authors_list(user, page),
+         "ix_lobbies_author_id_id"),
+        ("LobbyService._membership",
+         run(select(LobbyService._membership(1, 1))),
+         "uq_lobby_users_lobby_id_user_id"),
+        ("LobbyService._quick_join_candidate",
+         run(LobbyService._quick_join_candidate(1, quick_join)),
+         "ix_lobbies_open_bucket"),
+        ("User.lobbies",
+         run(select(lobby_users.c.lobby_id)
+             .where(lobby_users.c.user_id == 1)),
+         "ix_lobby_users_association_user_id"),
+        ("Game.bids",
+         run(select(Bid).where(with_parent(game, Game.bids))
+             .order_by(Bid.id)),
+         "ix_bids_game_id_id"),
+        ("User.bids",
+         run(select(Bid).where(with_parent(user, User.bids))
+             .order_by(Bid.id)),
+         "ix_bids_author_id_id"),
+    ]
+
+
+def _capture_statement(query):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not captured:
+            captured.append((conn, statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", capture)
+    try:
+        query()
+    finally:
+        event.remove(Engine, "before_cursor_execute", capture)
+    return captured[0]
+
+
+def _plan_indexes(conn, statement, parameters):
+    """
+    Имена индексов из плана: на PostgreSQL из EXPLAIN (FORMAT JSON) с
+    выключенным seq scan (на маленьких таблицах он всегда дешевле),
+    на SQLite из EXPLAIN QUERY PLAN
+    """
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = conn.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        indexes, nodes = set(), [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if "Index Name" in node:
+                indexes.add(node["Index Name"])
+            nodes.extend(node.get("Plans", []))
+        return indexes, plan
+
+    rows = conn.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    ).all()
+    details = [row[-1] for row in rows]
+    indexes = {
+        _sqlite_index_name(conn, detail.split(" INDEX ", 1)[1].split(" ", 1)[0])
+        for detail in details if " INDEX " in detail
+    }
+    return indexes, details
+
+
+def _sqlite_index_name(conn, name):
+    """
+    Индексы уникальных ограничений SQLite называет sqlite_autoindex_*,
+    возвращаем имя ограничения из метаданных с теми же колонками
+    """
+    if not name.startswith("sqlite_autoindex_"):
+        return name
+
+    table_name = name[len("sqlite_autoindex_"):].rsplit("_", 1)[0]
+    columns = [
+        row[2] for row in conn.exec_driver_sql(f"PRAGMA index_info('{name}')")
+    ]
+    for constraint in db.metadata.tables[table_name].constraints:
+        if (
+            isinstance(constraint, UniqueConstraint)
+            and [column.name for column in constraint.columns] == columns
+        ):
+            return constraint.name
+    return name
+
+
+def check_indexes(verbose=False) -> bool:
+    ok = True
+    for name, query, index in _index_checks():
+        conn, statement, parameters = _capture_statement(query)
+        indexes, plan = _plan_indexes(conn, statement, parameters)
+        used = index in indexes
+        ok = ok and used
+
+        status = "ok" if used else "MISSING"
+        click.echo(f"{status:8} {name}: expected {index}, "
+                   f"plan uses {', '.join(sorted(indexes)) or 'no index'}")
+        if verbose or not used:
+            click.echo(json.dumps(plan, indent=2, ensure_ascii=False))
+
+    db.session.rollback()
+    return ok
+
+
+def register_index_check(app):
+    @app.cli.command("check-indexes")
+    @click.option("--verbose", "-v", is_flag=True,
+                  help="Печатать план каждого запроса")
+    def check_indexes_command(verbose):
+        """
+        Проверяет через EXPLAIN что запросы сервисов используют индексы
+        """
+        if not check_indexes(verbose):
+            raise SystemExit(1)
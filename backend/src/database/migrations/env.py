@@ -8,6 +8,7 @@ from users import models
 from games import models
 from bids import models
 from lobbies import models
+from database import models
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
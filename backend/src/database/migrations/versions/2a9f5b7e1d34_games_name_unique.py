@@ -0,0 +1,40 @@
+"""games name unique
+
+Revision ID: 2a9f5b7e1d34
+Revises: 8d4e6a1f3c92
+Create Date: 2026-10-18 15:07:33.518206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a9f5b7e1d34'
+down_revision = '8d4e6a1f3c92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Ссылки на дубликаты игры переводим на самую раннюю с тем же именем,
+    # после чего дубликаты можно удалить
+    for table in ('bids', 'lobbies'):
+        op.execute(f"""
+            UPDATE {table} SET game_id = (
+                SELECT min(keeper.id) FROM games keeper
+                JOIN games duplicate ON duplicate.name = keeper.name
+                WHERE duplicate.id = {table}.game_id
+            )
+            WHERE game_id IS NOT NULL
+        """)
+    op.execute("""
+        DELETE FROM games WHERE id NOT IN (
+            SELECT min(id) FROM games GROUP BY name
+        )
+    """)
+    op.create_index('uq_games_name', 'games', ['name'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_games_name', table_name='games')
@@ -0,0 +1,40 @@
+"""trigram search indexes
+
+Revision ID: 3f9a1c7d2b8e
+Revises: 0246d3b14df4
+Create Date: 2026-10-18 12:10:24.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7d2b8e'
+down_revision = '0246d3b14df4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        op.create_index('ix_bids_description_trgm', 'bids', ['description'])
+        op.create_index('ix_games_name_trgm', 'games', ['name'])
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_bids_description_trgm', 'bids', ['description'],
+        postgresql_using='gin',
+        postgresql_ops={'description': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_games_name_trgm', 'games', ['name'],
+        postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'},
+    )
+
+
+def downgrade():
+    op.drop_index('ix_games_name_trgm', table_name='games')
+    op.drop_index('ix_bids_description_trgm', table_name='bids')
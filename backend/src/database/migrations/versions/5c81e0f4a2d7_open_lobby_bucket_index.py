@@ -0,0 +1,29 @@
+"""open lobby bucket index
+
+Revision ID: 5c81e0f4a2d7
+Revises: b7e2d41c9a05
+Create Date: 2026-10-18 13:40:12.927741
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c81e0f4a2d7'
+down_revision = 'b7e2d41c9a05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_lobbies_open_bucket', 'lobbies',
+        ['game_id', 'platform', 'skill_level'],
+        postgresql_where=sa.text('filled_slots < slots'),
+        sqlite_where=sa.text('filled_slots < slots'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_lobbies_open_bucket', table_name='lobbies')
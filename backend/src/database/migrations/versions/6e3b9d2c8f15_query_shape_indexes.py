@@ -0,0 +1,43 @@
+"""query shape indexes
+
+Revision ID: 6e3b9d2c8f15
+Revises: 2a9f5b7e1d34
+Create Date: 2026-10-18 15:41:09.862530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e3b9d2c8f15'
+down_revision = '2a9f5b7e1d34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_bids_game_id_id', 'bids', ['game_id', 'id'])
+    op.create_index('ix_bids_author_id_id', 'bids', ['author_id', 'id'])
+    op.create_index('ix_lobbies_author_id_id', 'lobbies', ['author_id', 'id'])
+    op.create_index('ix_lobbies_game_id', 'lobbies', ['game_id'])
+    op.create_index('ix_lobbies_platform_skill_level', 'lobbies',
+                    ['platform', 'skill_level'])
+    op.create_index(
+        'ix_lobbies_open_id', 'lobbies', ['id'],
+        postgresql_where=sa.text('filled_slots < slots'),
+        sqlite_where=sa.text('filled_slots < slots'),
+    )
+    op.create_index('ix_lobby_users_association_user_id',
+                    'lobby_users_association', ['user_id', 'lobby_id'])
+
+
+def downgrade():
+    op.drop_index('ix_lobby_users_association_user_id',
+                  table_name='lobby_users_association')
+    op.drop_index('ix_lobbies_open_id', table_name='lobbies')
+    op.drop_index('ix_lobbies_platform_skill_level', table_name='lobbies')
+    op.drop_index('ix_lobbies_game_id', table_name='lobbies')
+    op.drop_index('ix_lobbies_author_id_id', table_name='lobbies')
+    op.drop_index('ix_bids_author_id_id', table_name='bids')
+    op.drop_index('ix_bids_game_id_id', table_name='bids')
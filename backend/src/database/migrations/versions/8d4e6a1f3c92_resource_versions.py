@@ -0,0 +1,33 @@
+"""resource versions
+
+Revision ID: 8d4e6a1f3c92
+Revises: 5c81e0f4a2d7
+Create Date: 2026-10-18 14:22:51.304187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4e6a1f3c92'
+down_revision = '5c81e0f4a2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    resource_versions = op.create_table(
+        'resource_versions',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(resource_versions, [
+        {'name': name, 'version': 0}
+        for name in ('bids', 'games', 'lobbies', 'users')
+    ])
+
+
+def downgrade():
+    op.drop_table('resource_versions')
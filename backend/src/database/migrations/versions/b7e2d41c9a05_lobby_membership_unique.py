@@ -0,0 +1,62 @@
+"""lobby membership unique key
+
+Revision ID: b7e2d41c9a05
+Revises: 3f9a1c7d2b8e
+Create Date: 2026-10-18 13:02:51.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d41c9a05'
+down_revision = '3f9a1c7d2b8e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Убираем неполные строки и дубли участия, которые могли появиться
+    # при гонках вступления, и пересчитываем заполненность лобби
+    op.execute(
+        "DELETE FROM lobby_users_association "
+        "WHERE lobby_id IS NULL OR user_id IS NULL"
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "DELETE FROM lobby_users_association a "
+            "USING lobby_users_association b "
+            "WHERE a.ctid > b.ctid "
+            "AND a.lobby_id = b.lobby_id AND a.user_id = b.user_id"
+        )
+    else:
+        op.execute(
+            "DELETE FROM lobby_users_association WHERE rowid NOT IN ("
+            "SELECT min(rowid) FROM lobby_users_association "
+            "GROUP BY lobby_id, user_id)"
+        )
+    op.execute(
+        "UPDATE lobbies SET filled_slots = ("
+        "SELECT count(*) FROM lobby_users_association "
+        "WHERE lobby_users_association.lobby_id = lobbies.id)"
+    )
+
+    with op.batch_alter_table('lobby_users_association') as batch_op:
+        batch_op.alter_column('lobby_id', existing_type=sa.Integer(),
+                              nullable=False)
+        batch_op.alter_column('user_id', existing_type=sa.Integer(),
+                              nullable=False)
+        batch_op.create_unique_constraint(
+            'uq_lobby_users_lobby_id_user_id', ['lobby_id', 'user_id']
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('lobby_users_association') as batch_op:
+        batch_op.drop_constraint('uq_lobby_users_lobby_id_user_id',
+                                 type_='unique')
+        batch_op.alter_column('user_id', existing_type=sa.Integer(),
+                              nullable=True)
+        batch_op.alter_column('lobby_id', existing_type=sa.Integer(),
+                              nullable=True)
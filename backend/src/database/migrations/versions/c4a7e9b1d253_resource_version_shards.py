@@ -0,0 +1,68 @@
+"""resource version shards
+
+Revision ID: c4a7e9b1d253
+Revises: 6e3b9d2c8f15
+Create Date: 2026-10-18 19:02:13.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a7e9b1d253'
+down_revision = '6e3b9d2c8f15'
+branch_labels = None
+depends_on = None
+
+
+def _resource_versions(*primary_key):
+    """
+    Текущий вид таблицы для batch режима. На SQLite отраженный первичный
+    ключ без имени, его нельзя явно удалить, и временная таблица получила
+    бы ключ, не совпадающий с объявленным
+    """
+    columns = [
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+    ]
+    if 'shard' in primary_key:
+        columns.append(sa.Column('shard', sa.Integer(), nullable=False,
+                                 server_default='0'))
+    return sa.Table(
+        'resource_versions', sa.MetaData(), *columns,
+        sa.PrimaryKeyConstraint(*primary_key, name='resource_versions_pkey'),
+    )
+
+
+def upgrade():
+    # На PostgreSQL batch режим выполняет обычные ALTER, на SQLite
+    # пересоздает таблицу
+    with op.batch_alter_table(
+        'resource_versions', copy_from=_resource_versions('name')
+    ) as batch_op:
+        batch_op.drop_constraint('resource_versions_pkey', type_='primary')
+        batch_op.add_column(sa.Column(
+            'shard', sa.Integer(), nullable=False, server_default='0'
+        ))
+        batch_op.create_primary_key('resource_versions_pkey',
+                                    ['name', 'shard'])
+
+
+def downgrade():
+    # Версия ресурса это сумма его строк, складываем их в строку 0
+    op.execute("""
+        UPDATE resource_versions AS target SET version = totals.version
+        FROM (
+            SELECT name, SUM(version) AS version
+            FROM resource_versions GROUP BY name
+        ) AS totals
+        WHERE target.name = totals.name AND target.shard = 0
+    """)
+    op.execute("DELETE FROM resource_versions WHERE shard <> 0")
+    with op.batch_alter_table(
+        'resource_versions', copy_from=_resource_versions('name', 'shard')
+    ) as batch_op:
+        batch_op.drop_constraint('resource_versions_pkey', type_='primary')
+        batch_op.drop_column('shard')
+        batch_op.create_primary_key('resource_versions_pkey', ['name'])
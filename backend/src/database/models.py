@@ -0,0 +1,15 @@
+from extensions import db
+
+
+class ResourceVersion(db.Model):
+    """
+    Счетчик версий ресурса (таблицы), увеличивается сервисами при каждой
+    записи и используется для ETag списков и деталей. Счетчик часто
+    изменяемого ресурса разнесен по нескольким строкам (shard), версия
+    это сумма его строк
+    """
+    __tablename__ = "resource_versions"
+    name = db.Column(db.String(50), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, default=0,
+                      server_default="0")
+    version = db.Column(db.BigInteger, nullable=False, default=0)
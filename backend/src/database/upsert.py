@@ -0,0 +1,13 @@
+from extensions import db
+
+
+def upsert_insert(table):
+    """
+    INSERT диалекта текущей БД, у которого есть on_conflict_do_update
+    (PostgreSQL в production, SQLite в бенчмарках и локальных запусках)
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
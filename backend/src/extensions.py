@@ -1,12 +1,29 @@
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flasgger import Swagger
+
+from core.compression import Compression
+from core.identity_cache import IdentityCache
+from core.metrics import Metrics
+from core.password_hasher import PasswordHasher
+from core.replicas import ReplicaRouting, RoutingSession
+from core.pubsub import PubSub
+from core.rate_limit import RateLimiter
+from core.sse import EventStreams
+from games.cache import GameCatalog
 
 """
 Инициализация расширений
 """
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
-swagger = Swagger()
+pubsub = PubSub()
+identity_cache = IdentityCache()
+password_hasher = PasswordHasher()
+event_streams = EventStreams()
+compression = Compression()
+replica_routing = ReplicaRouting()
+metrics = Metrics()
+rate_limiter = RateLimiter()
+game_catalog = GameCatalog()
@@ -0,0 +1,265 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import jsonify
+from pydantic_core import to_json
+
+INVALIDATION_CHANNEL = "game_catalog_invalidate"
+VERSION_NAME = "games"
+# Попытки прочитать каталог без параллельной записи между чтениями версии
+LOAD_ATTEMPTS = 3
+
+
+class _Snapshot:
+    """
+    Состояние каталога на одну версию ресурса games. rows и positions
+    (порядок списка из БД) строятся лениво и сбрасываются при записи,
+    by_id обновляется сквозной записью
+    """
+    def __init__(self, version, by_id, rows=None):
+        self.version = version
+        self.by_id = by_id
+        self.rows = rows
+        self.positions = None
+        if rows is not None:
+            self.positions = {
+                (row["name"], row["id"]): index for index, row in enumerate(rows)
+            }
+        self.pages = OrderedDict()
+
+
+class GameCatalog:
+    """
+    Кеш каталога игр в процессе воркера: строки формы GameSchemaRead по id,
+    список в порядке (name, id) и готовые байты страниц GET /api/games.
+    Каталог почти не меняется, поэтому проверка версии ресурса games
+    (таблица resource_versions) делается не чаще CHECK_INTERVAL секунд,
+    а запись в другом воркере сообщается через pubsub, чтобы проверка
+    прошла на следующем обращении
+    """
+    def __init__(self, check_interval: float = 1.0, page_cache_size: int = 256):
+        self.enabled = True
+        self.check_interval = check_interval
+        self.page_cache_size = page_cache_size
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = Lock()
+        self._pubsub = None
+
+    def init_app(self, app, pubsub):
+        config = app.config["GAMES_CACHE"]
+        self.enabled = config["ENABLED"]
+        self.check_interval = config["CHECK_INTERVAL"]
+        self.page_cache_size = config["PAGE_CACHE_SIZE"]
+        self._pubsub = pubsub
+        pubsub.subscribe(INVALIDATION_CHANNEL, self._on_invalidate_message)
+
+        if app.config["INTERNAL_ENDPOINTS"]:
+            app.add_url_rule(
+                "/internal/game-catalog",
+                "game_catalog_stats",
+                lambda: jsonify(self.stats()),
+            )
+        app.extensions["game_catalog"] = self
+
+    def _current(self, version=None) -> _Snapshot | None:
+        """
+        Актуальный снимок, каталог перечитывается только при более новой
+        версии. Реплики с разным отставанием дают запросам разные версии,
+        и откат общего снимка к старой перечитывал бы каталог на каждый
+        запрос. version - уже прочитанная в запросе версия games (из нее
+        собран ETag ответа), тогда возвращается снимок ровно этой версии
+        или None, и запрос отвечает из БД
+        """
+        snapshot = self._snapshot
+        if version is not None:
+            if snapshot is None or snapshot.version < version:
+                snapshot = self._load()
+            return snapshot if snapshot.version == version else None
+
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        version = self._read_version()
+        self._checked_at = now
+        if snapshot is None or snapshot.version < version:
+            snapshot = self._load()
+        return snapshot
+
+    @staticmethod
+    def _read_version():
+        from core.conditional_get import get_versions
+
+        return get_versions([VERSION_NAME]).get(VERSION_NAME, 0)
+
+    def _load(self) -> _Snapshot:
+        """
+        Читает каталог вместе с его версией. Версия читается до и после
+        строк, запись игры меняет версию в той же транзакции, так что
+        совпадение значит что строки именно этой версии. Если каталог
+        меняется прямо сейчас, снимок без версии отдается только
+        вызывающему и не сохраняется
+        """
+        from core.pagination import paginate
+        from games.models import Game
+        from games.services import GameService
+
+        projection = GameService.read_projection
+        for _ in range(LOAD_ATTEMPTS):
+            version = self._read_version()
+            rows = projection.rows(
+                paginate(projection.select(), [Game.name, Game.id], None).items
+            )
+            if self._read_version() == version:
+                break
+        else:
+            version = None
+
+        snapshot = _Snapshot(version, {row["id"]: row for row in rows}, rows)
+        if version is None:
+            return snapshot
+
+        with self._lock:
+            current = self._snapshot
+            if current is None or current.version < version:
+                self._snapshot = snapshot
+        return snapshot
+
+    def contains(self, game_id: int) -> bool:
+        """
+        Есть ли игра в каталоге, на попадании без запроса в БД. Игра
+        созданная в другом воркере еще до проверки версии ищется в БД
+        """
+        return self.get_row(game_id) is not None or self._exists_in_db(game_id)
+
+    def get_row(self, game_id: int):
+        """
+        Строка каталога по id, None если кеш выключен или игры в нем нет
+        """
+        if not self.enabled:
+            return None
+        return self._current().by_id.get(game_id)
+
+    def rows_by_ids(self, ids, version=None):
+        """
+        Строки каталога по id и множество id которых в нем нет.
+        version - версия games из ETag ответа, см. _current
+        """
+        if not self.enabled:
+            return [], set(ids)
+
+        snapshot = self._current(version)
+        if snapshot is None:
+            return [], set(ids)
+
+        by_id = snapshot.by_id
+        rows = [by_id[game_id] for game_id in ids if game_id in by_id]
+        return rows, {game_id for game_id in ids if game_id not in by_id}
+
+    @staticmethod
+    def _exists_in_db(game_id):
+        from extensions import db
+        from games.models import Game
+
+        return db.session.get(Game, game_id) is not None
+
+    def page_bytes(self, page, names=(), version=None) -> bytes | None:
+        """
+        Тело ответа GET /api/games для страницы page с полями names (все
+        если пусто) на версию каталога version (см. _current). None если
+        снимка этой версии нет или курсор не из текущего каталога, тогда
+        страница собирается из БД
+        """
+        from core.pagination import decode_cursor, encode_cursor
+
+        if not self.enabled:
+            return None
+
+        snapshot = self._current(version)
+        if snapshot is None:
+            return None
+        if snapshot.rows is None:
+            snapshot = self._load()
+            if version is not None and snapshot.version != version:
+                return None
+
+        key = (page.limit, page.cursor, frozenset(names))
+        with self._lock:
+            body = snapshot.pages.get(key)
+            if body is not None:
+                snapshot.pages.move_to_end(key)
+                return body
+
+        start = 0
+        if page.cursor is not None:
+            name, game_id = decode_cursor(page.cursor, (str, int))
+            position = snapshot.positions.get((name, game_id))
+            if position is None:
+                return None
+            start = position + 1
+
+        rows = snapshot.rows[start:start + page.limit]
+        next_cursor = None
+        if start + page.limit < len(snapshot.rows):
+            next_cursor = encode_cursor([rows[-1]["name"], rows[-1]["id"]])
+        if names:
+            rows = [{name: row[name] for name in row if name in names}
+                    for row in rows]
+        body = to_json({"games": rows, "next_cursor": next_cursor})
+
+        with self._lock:
+            snapshot.pages[key] = body
+            while len(snapshot.pages) > self.page_cache_size:
+                snapshot.pages.popitem(last=False)
+        return body
+
+    def store(self, game, version):
+        """
+        Сквозная запись созданной игры, version это версия games после
+        коммита. Если между версиями были чужие записи, каталог
+        перечитывается при следующем обращении
+        """
+        from games.services import GameService
+
+        projection = GameService.read_projection
+        row = {field: getattr(game, field) for field in projection.fields}
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version - 1:
+                self._snapshot = None
+            else:
+                # Порядок строк в БД зависит от collation, список
+                # перечитается при следующем запросе страницы
+                self._snapshot = _Snapshot(version,
+                                           {**snapshot.by_id, row["id"]: row})
+        self._notify()
+
+    def invalidate(self):
+        """
+        Сбрасывает каталог после массового изменения, например импорта,
+        он перечитается при следующем обращении
+        """
+        self.clear()
+        self._notify()
+
+    def _notify(self):
+        if self._pubsub is not None:
+            self._pubsub.publish(INVALIDATION_CHANNEL, {})
+
+    def _on_invalidate_message(self, message):
+        # Версию проверит следующее обращение
+        self._checked_at = 0.0
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "games": len(snapshot.by_id) if snapshot else 0,
+            "pages": len(snapshot.pages) if snapshot else 0,
+        }
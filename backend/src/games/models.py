@@ -1,8 +1,17 @@
-from app import db
+from extensions import db
 
 
 class Game(db.Model):
     __tablename__ = "games"
+    __table_args__ = (
+        db.Index(
+            "ix_games_name_trgm", "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        # Ключ upsert при массовом импорте каталога
+        db.Index("uq_games_name", "name", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(500), nullable=False)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict
 from pydantic.fields import Field
@@ -19,4 +19,25 @@ class GameSchemaRead(GameSchemaWrite):
 
 class GameListSchema(BaseModel):
     games: List[GameSchemaRead]
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    next_cursor: Optional[str] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class GameImportErrorSchema(BaseModel):
+    line: int
+    errors: List[str]
+
+
+class GameImportBatchSchema(BaseModel):
+    batch: int
+    rows: int
+    inserted: int = 0
+    updated: int = 0
+    errors: List[GameImportErrorSchema] = []
+    error: Optional[str] = None
+
+
+class GameImportReportSchema(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    batches: List[GameImportBatchSchema] = []
@@ -1,22 +1,299 @@
-from app import db
+import csv
+import io
+import json
+from typing import List
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+from werkzeug.exceptions import Conflict
+
+from extensions import db, game_catalog
+from core.conditional_get import bump_versions, request_version
+from core.fieldsets import ALL_FIELDS, FieldSet
+from core.pagination import paginate, PageParams
+from core.projection import Projection
+from core.replicas import read_only
+from database.upsert import upsert_insert
 from games.models import Game
-from games.schemas import GameSchemaWrite, GameSchemaRead
+from games.schemas import (
+    GameSchemaWrite,
+    GameSchemaRead,
+    GameImportBatchSchema,
+    GameImportErrorSchema,
+    GameImportReportSchema,
+)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_COLUMNS = ("name", "description", "release_date", "url_image")
+IMPORT_BATCH_SIZE = 1000
+
+games_adapter = TypeAdapter(List[GameSchemaWrite])
 
 
 class GameService:
+    read_projection = Projection(GameSchemaRead, Game)
+
     @staticmethod
     def get_by_id(id: int):
-        return db.session.get(Game, id)
+        """
+        Игра из кеша каталога без запроса в БД, объект присоединяется к
+        текущей сессии без загрузки. Промах ищется в БД
+        """
+        row = game_catalog.get_row(id)
+        if row is None:
+            return db.session.get(Game, id)
 
+        game = Game(**row)
+        make_transient_to_detached(game)
+        return db.session.merge(game, load=False)
+
+
+    @staticmethod
+    @read_only
+    def get_all(page: PageParams = None):
+        return paginate(db.session.query(Game), [Game.name, Game.id], page)
 
     @staticmethod
-    def get_all():
-        return db.session.query(Game).all()
+    @read_only
+    def get_all_rows(page: PageParams = None, fields: FieldSet = ALL_FIELDS):
+        """
+        Тоже что get_all, но строками-словарями формы GameSchemaRead
+        с полями fields
+        """
+        projection = GameService.read_projection.only(fields.names)
+        games = paginate(projection.select(), [Game.name, Game.id], page)
+        games.items = projection.rows(games.items)
+        return games
 
 
     @staticmethod
     def create(obj: GameSchemaWrite) -> GameSchemaRead:
         game = Game(**obj.model_dump())
-        db.session.add(game)
-        db.session.commit()
+        try:
+            db.session.add(game)
+            versions = bump_versions("games")
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise Conflict("Game with this name already exists")
+        game_catalog.store(game, versions["games"])
         return game
+
+    @staticmethod
+    def exists(game_id: int) -> bool:
+        """
+        Проверка игры по кешу каталога, без запроса в БД на попадании
+        """
+        return game_catalog.contains(game_id)
+
+    @staticmethod
+    def get_rows_by_ids(ids) -> list[dict]:
+        """
+        Игры формы GameSchemaRead по множеству id из кеша каталога,
+        в БД догружаются только отсутствующие в нем
+        """
+        rows, missing = game_catalog.rows_by_ids(ids, request_version("games"))
+        if missing:
+            projection = GameService.read_projection
+            rows += projection.rows(db.session.execute(
+                projection.select().where(Game.id.in_(missing))
+            ).all())
+        return sorted(rows, key=lambda row: row["id"])
+
+    @staticmethod
+    def get_page_bytes(page: PageParams, fields: FieldSet = ALL_FIELDS):
+        """
+        Готовое тело GET /api/games из кеша каталога, None если страницу
+        нужно собрать из БД (кеш выключен или курсор устарел)
+        """
+        return game_catalog.page_bytes(page, fields.names,
+                                       request_version("games"))
+
+    @staticmethod
+    def bulk_import(stream, format: str,
+                    batch_size: int = IMPORT_BATCH_SIZE) -> GameImportReportSchema:
+        """
+        Импорт каталога из текстового потока CSV/NDJSON одной транзакцией.
+        Строки читаются и валидируются пачками, игра с уже существующим
+        именем обновляется. Каждая пачка грузится в своем savepoint, поэтому
+        ошибка БД отменяет только ее, а остальные попадают в отчет
+        """
+        report = GameImportReportSchema()
+        batch = []
+        for line, row in _read_import_rows(stream, format):
+            batch.append((line, row))
+            if len(batch) >= batch_size:
+                report.batches.append(_import_batch(len(report.batches), batch))
+                batch = []
+        if batch:
+            report.batches.append(_import_batch(len(report.batches), batch))
+
+        for batch_report in report.batches:
+            report.inserted += batch_report.inserted
+            report.updated += batch_report.updated
+            report.failed += len(batch_report.errors)
+            if batch_report.error is not None:
+                report.failed += batch_report.rows - len(batch_report.errors)
+
+        changed = report.inserted or report.updated
+        if changed:
+            bump_versions("games")
+        db.session.commit()
+        if changed:
+            game_catalog.invalidate()
+        return report
+
+
+def _read_import_rows(stream, format):
+    """
+    Построчно читает поток не загружая его в память целиком, отдает пары
+    (номер строки, словарь), для нечитаемой строки вместо словаря ошибка
+    """
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # В CSV нет null, пустая ячейка означает отсутствие значения
+            yield reader.line_num, {
+                key: value if value != "" else None
+                for key, value in row.items()
+            }
+    elif format == "ndjson":
+        for line, raw in enumerate(stream, 1):
+            if not raw.strip():
+                continue
+            try:
+                yield line, json.loads(raw)
+            except ValueError as e:
+                yield line, e
+    else:
+        raise ValueError(f"Unknown import format {format}")
+
+
+def _validate_batch(batch):
+    """
+    Валидирует пачку одним вызовом TypeAdapter, при ошибках повторно
+    валидирует только корректные строки. Дубликаты имен внутри пачки
+    схлопываются, побеждает последняя строка
+    """
+    errors = {}
+    candidates = []
+    for line, row in batch:
+        if isinstance(row, Exception):
+            errors[line] = [str(row)]
+        else:
+            candidates.append((line, row))
+
+    try:
+        games = games_adapter.validate_python([row for _, row in candidates])
+    except ValidationError as e:
+        invalid = set()
+        for error in e.errors():
+            index, *field = error["loc"]
+            invalid.add(index)
+            message = error["msg"]
+            if field:
+                message = f"{'.'.join(map(str, field))}: {message}"
+            errors.setdefault(candidates[index][0], []).append(message)
+
+        candidates = [
+            candidate for index, candidate in enumerate(candidates)
+            if index not in invalid
+        ]
+        games = games_adapter.validate_python([row for _, row in candidates])
+
+    rows = {game.name: game.model_dump() for game in games}
+    return list(rows.values()), [
+        GameImportErrorSchema(line=line, errors=messages)
+        for line, messages in sorted(errors.items())
+    ]
+
+
+def _import_batch(number, batch):
+    rows, errors = _validate_batch(batch)
+    report = GameImportBatchSchema(batch=number, rows=len(batch), errors=errors)
+    if not rows:
+        return report
+
+    savepoint = db.session.begin_nested()
+    try:
+        existing = set(db.session.scalars(
+            select(Game.name).where(Game.name.in_([row["name"] for row in rows]))
+        ))
+        _upsert(rows)
+        savepoint.commit()
+    except DBAPIError as e:
+        savepoint.rollback()
+        report.error = str(e.orig)
+        return report
+
+    report.inserted = len(rows) - len(existing)
+    report.updated = len(existing)
+    return report
+
+
+def _upsert(rows):
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        cursor = connection.connection.dbapi_connection.cursor()
+        if hasattr(cursor, "copy_expert"):
+            with cursor:
+                return _copy_upsert(cursor, rows)
+
+    statement = upsert_insert(Game)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Game.name],
+            set_={
+                column: statement.excluded[column]
+                for column in IMPORT_COLUMNS if column != "name"
+            },
+        ),
+        rows,
+    )
+
+
+def _copy_field(value):
+    """
+    Поле CSV для COPY: значение всегда в кавычках, а None пустым полем
+    без кавычек, только его COPY читает как NULL. csv.QUOTE_NONNUMERIC
+    пишет None как "", что COPY загрузил бы пустой строкой
+    """
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_upsert(cursor, rows):
+    """
+    COPY во временную таблицу и один INSERT ... SELECT с ON CONFLICT,
+    на PostgreSQL это на порядок быстрее executemany
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(
+            _copy_field(row[column].isoformat() if column == "release_date"
+                        else row[column])
+            for column in IMPORT_COLUMNS
+        ) + "\n")
+    buffer.seek(0)
+
+    columns = ", ".join(IMPORT_COLUMNS)
+    db.session.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS games_import ("
+        "name varchar(100), description varchar(500), "
+        "release_date date, url_image varchar"
+        ") ON COMMIT DROP"
+    ))
+    db.session.execute(text("TRUNCATE games_import"))
+    cursor.copy_expert(
+        f"COPY games_import ({columns}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+    db.session.execute(text(
+        f"INSERT INTO games ({columns}) SELECT {columns} FROM games_import "
+        "ON CONFLICT (name) DO UPDATE SET "
+        "description = EXCLUDED.description, "
+        "release_date = EXCLUDED.release_date, "
+        "url_image = EXCLUDED.url_image"
+    ))
@@ -1,7 +1,16 @@
-from flask import Blueprint
+import io
+
+import click
+from flask import Blueprint, Response, request
+from werkzeug.exceptions import BadRequest
+
+from core.fieldsets import FieldSet
+from core.pagination import PageParams
 from core.rest_api_extension import rest_api
-from games.schemas import GameListSchema, GameSchemaRead, GameSchemaWrite
-from games.services import GameService
+from games.schemas import GameListSchema, GameSchemaRead, GameSchemaWrite, \
+    GameImportReportSchema
+from games.services import GameService, IMPORT_FORMATS, IMPORT_BATCH_SIZE
+from users.models import User
 
 
 games_bp = Blueprint('games', __name__, url_prefix='/api/games')
@@ -11,10 +20,15 @@ games_bp = Blueprint('games', __name__, url_prefix='/api/games')
 @rest_api(
      description="Получение списка игр",
      responses=[{200: GameListSchema}],
+     etag_resources=["games"],
 )
-def get_games_list():
-     games = GameService.get_all()
-     return GameListSchema(games=[GameSchemaRead.model_validate(game, from_attributes=True) for game in games])
+def get_games_list(page: PageParams, fields: FieldSet):
+     body = GameService.get_page_bytes(page, fields)
+     if body is not None:
+          return Response(body, content_type="application/json")
+
+     games = GameService.get_all_rows(page, fields)
+     return {"games": games.items, "next_cursor": games.next_cursor}
 
 
 @games_bp.route("", methods=["POST"])
@@ -26,3 +40,64 @@ def create_game(game_obj: GameSchemaWrite):
      game = GameService.create(game_obj)
      return GameSchemaRead.model_validate(game)
 
+
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+MAX_IMPORT_BATCH_SIZE = 10000
+
+
+@games_bp.route("/bulk", methods=["POST"])
+@rest_api(
+     description="Массовый импорт каталога игр из CSV (text/csv) или NDJSON"
+                 " (application/x-ndjson), игра с существующим именем"
+                 " обновляется. Тело читается потоком",
+     responses=[{200: GameImportReportSchema}],
+     query_params=["format", "batch_size"],
+)
+def bulk_import_games(user: User):
+     format = request.args.get("format") or \
+          IMPORT_CONTENT_TYPES.get(request.mimetype)
+     if format not in IMPORT_FORMATS:
+          raise BadRequest("Body must be text/csv or application/x-ndjson")
+
+     batch_size = request.args.get("batch_size", IMPORT_BATCH_SIZE, type=int)
+     if not 1 <= batch_size <= MAX_IMPORT_BATCH_SIZE:
+          raise BadRequest(
+               f"batch_size must be between 1 and {MAX_IMPORT_BATCH_SIZE}"
+          )
+
+     stream = io.TextIOWrapper(
+          io.BufferedReader(request.stream),
+          encoding=request.mimetype_params.get("charset", "utf-8"),
+          newline="",
+     )
+     return GameService.bulk_import(stream, format, batch_size)
+
+
+@games_bp.cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "format", type=click.Choice(IMPORT_FORMATS),
+              help="По умолчанию определяется по расширению файла")
+@click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True)
+def import_games(path, format, batch_size):
+     """
+     Импортирует каталог игр из CSV или NDJSON файла
+     """
+     if format is None:
+          format = "csv" if path.endswith(".csv") else "ndjson"
+
+     with open(path, encoding="utf-8", newline="") as file:
+          report = GameService.bulk_import(file, format, batch_size)
+
+     for batch in report.batches:
+          if batch.error is not None:
+               click.echo(f"batch {batch.batch}: failed, {batch.error}")
+          for error in batch.errors:
+               click.echo(f"line {error.line}: {'; '.join(error.errors)}")
+     click.echo(
+          f"inserted {report.inserted}, updated {report.updated},"
+          f" failed {report.failed}"
+     )
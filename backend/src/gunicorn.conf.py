@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+import tempfile
+from os import getenv
+
+"""
+Конфигурация Gunicorn для production, запуск из src/:
+gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+bind = getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# sync - один запрос на воркер, gthread - потоки (по умолчанию, держат
+# keep-alive), gevent - требует установленного gevent
+worker_class = getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(getenv("GUNICORN_THREADS", "4"))
+worker_connections = int(getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+# Открытый SSE поток держит поток gthread воркера все время подключения.
+# В docker-compose их обслуживает отдельный сервис events (nginx
+# направляет туда /api/lobbies/.../events) с большим GUNICORN_THREADS и
+# своим EVENT_STREAMS_MAX, а основным воркерам остается половина потоков,
+# сверх нее клиент получает 503 с Retry-After
+if worker_class == "gevent":
+    os.environ.setdefault("EVENT_STREAMS_MAX", str(worker_connections // 2))
+else:
+    os.environ.setdefault("EVENT_STREAMS_MAX", str(threads // 2))
+
+# Событиям SSE, инвалидации кешей и read-your-writes нужен брокер общий
+# для воркеров, memory раздает сообщения только внутри процесса
+if workers > 1:
+    os.environ.setdefault("PUBSUB_BACKEND", "postgres")
+
+# Приложение импортируется и прогревается (warm_up в wsgi.py) один раз
+# в мастере, воркеры получают его через fork с общими страницами памяти
+preload_app = getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+
+# Должен быть больше keepalive_timeout upstream в nginx, иначе gunicorn
+# закроет соединение которое nginx считает живым и запрос получит 502
+keepalive = int(getenv("GUNICORN_KEEPALIVE", "75"))
+timeout = int(getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Перезапуск воркеров ограничивает рост памяти, jitter разносит их во времени
+max_requests = int(getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# Воркеры сбрасывают метрики в общий каталог, /metrics любого воркера
+# отдает сумму по всем. Задается до импорта приложения (preload)
+os.environ.setdefault(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "teamsync-metrics")
+)
+
+# Ведра rate limit в общем файле, иначе лимит действует на каждый воркер
+os.environ.setdefault("RATE_LIMIT_BACKEND", "shared")
+# X-Real-IP принимается только от nginx, он в частной сети docker
+os.environ.setdefault(
+    "RATE_LIMIT_TRUSTED_PROXIES",
+    "127.0.0.1/32,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16",
+)
+
+forwarded_allow_ips = getenv("GUNICORN_FORWARDED_ALLOW_IPS", "*")
+accesslog = getenv("GUNICORN_ACCESS_LOG", "-")
+
+
+def on_starting(server):
+    """
+    Файлы воркеров прошлого запуска не должны попасть в сумму метрик.
+    Брокер memory с несколькими воркерами (например -w из командной
+    строки) молча теряет сообщения, такой запуск останавливается
+    """
+    from core.metrics import clear_worker_files
+
+    if server.cfg.workers > 1 and \
+            os.environ.get("PUBSUB_BACKEND", "memory") == "memory":
+        raise RuntimeError("PUBSUB_BACKEND=memory does not deliver messages "
+                           "between gunicorn workers, use postgres")
+
+    if os.path.isdir(os.environ["METRICS_DIR"]):
+        clear_worker_files(os.environ["METRICS_DIR"])
+
+
+def post_fork(server, worker):
+    """
+    При preload пул соединений создается в мастере, сокеты после fork
+    общие у всех воркеров. close=False только забывает их в дочернем
+    процессе, не закрывая соединения родителя
+    """
+    from extensions import db
+
+    with worker.app.wsgi().app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    if worker_class == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("psycogreen is not installed, psycopg2 "
+                               "queries will block the gevent loop")
+        else:
+            patch_psycopg()
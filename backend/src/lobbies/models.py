@@ -1,15 +1,37 @@
-from app import db
+from extensions import db
 
 
 users = db.Table(
     'lobby_users_association', db.metadata,
-    db.Column('lobby_id', db.Integer, db.ForeignKey('lobbies.id', ondelete="CASCADE")),
-    db.Column('user_id', db.Integer, db.ForeignKey('users.id', ondelete="CASCADE")),
+    db.Column('lobby_id', db.Integer, db.ForeignKey('lobbies.id', ondelete="CASCADE"), nullable=False),
+    db.Column('user_id', db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False),
+    db.UniqueConstraint('lobby_id', 'user_id', name='uq_lobby_users_lobby_id_user_id'),
+    # Лобби пользователя (backref lobbies) и каскадное удаление пользователя,
+    # проверки членства покрывает уникальный ключ выше
+    db.Index('ix_lobby_users_association_user_id', 'user_id', 'lobby_id'),
 )
 
 
 class Lobby(db.Model):
     __tablename__ = "lobbies"
+    __table_args__ = (
+        # Индекс открытых лобби по корзинам для быстрого подбора
+        db.Index(
+            "ix_lobbies_open_bucket", "game_id", "platform", "skill_level",
+            postgresql_where=db.text("filled_slots < slots"),
+            sqlite_where=db.text("filled_slots < slots"),
+        ),
+        # Список открытых лобби в порядке keyset пагинации
+        db.Index(
+            "ix_lobbies_open_id", "id",
+            postgresql_where=db.text("filled_slots < slots"),
+            sqlite_where=db.text("filled_slots < slots"),
+        ),
+        # Лобби автора, сразу в порядке пагинации
+        db.Index("ix_lobbies_author_id_id", "author_id", "id"),
+        db.Index("ix_lobbies_game_id", "game_id"),
+        db.Index("ix_lobbies_platform_skill_level", "platform", "skill_level"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     members = db.relationship(
         'User',
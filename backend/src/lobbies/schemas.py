@@ -1,9 +1,11 @@
 from datetime import datetime
+from typing import Optional
 
-from pydantic import BaseModel, constr, conint
+from pydantic import BaseModel, constr, conint, model_validator
 
 from users.schemas import UserReadSchema
 from games.schemas import GameSchemaRead
+from core.normalization import IncludedSchema
 
 
 class LobbyBaseSchema(BaseModel):
@@ -21,7 +23,8 @@ class LobbyBaseSchema(BaseModel):
 class LobbyReadSchema(LobbyBaseSchema):
     id: int
     members: list[UserReadSchema]
-    author: UserReadSchema
+    # lobbies.author_id допускает NULL
+    author: Optional[UserReadSchema]
     filled_slots: int
     game: GameSchemaRead
 
@@ -30,12 +33,41 @@ class LobbyWriteSchema(LobbyBaseSchema):
     game_id: int
 
 
+class LobbyQuickJoinSchema(BaseModel):
+    game_id: int
+    platform: constr(max_length=30)
+    min_skill: conint(ge=0, le=10) = 0
+    max_skill: conint(ge=0, le=10) = 10
+
+    @model_validator(mode="after")
+    def validate_skill_range(self):
+        if self.min_skill > self.max_skill:
+            raise ValueError("min_skill must be less or equal max_skill")
+        return self
+
+
 class LobbyListSchema(BaseModel):
     lobbies: list[LobbyReadSchema]
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+# Лобби нормализованного списка, связи лежат в included
+class LobbyRefSchema(LobbyBaseSchema):
+    id: int
+    member_ids: list[int]
+    author_id: Optional[int]
+    filled_slots: int
+    game_id: int
+
+
+class LobbyListNormalizedSchema(BaseModel):
+    lobbies: list[LobbyRefSchema]
+    included: IncludedSchema
+    next_cursor: Optional[str] = None
+
+
 class NonResponseSchema(BaseModel):
     pass
\ No newline at end of file
@@ -1,57 +1,171 @@
-from werkzeug.exceptions import NotFound
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload, joinedload, contains_eager
+from werkzeug.exceptions import NotFound, Conflict
 
-from app import db
+from extensions import db, event_streams
+from core.conditional_get import bump_versions
+from core.fieldsets import ALL_FIELDS, FieldSet
+from core.normalization import build_included, ref_row
+from core.pagination import paginate, Page, PageParams
+from core.replicas import read_only
+from core.search import SubstringSearch
 from games.models import Game
 from games.services import GameService
-from lobbies.models import Lobby
-from lobbies.schemas import LobbyWriteSchema
+from lobbies.models import Lobby, users as lobby_users
+from lobbies.schemas import LobbyWriteSchema, LobbyQuickJoinSchema, \
+    LobbyRefSchema, LobbyListNormalizedSchema
 from users.models import User
 
 
 class LobbyService:
     @staticmethod
-    def get(id: int):
-        return db.session.query(Lobby).get(id)
+    def read_options(fields: FieldSet = ALL_FIELDS):
+        """
+        Стратегии загрузки связей под форму ответа LobbyReadSchema,
+        чтобы лобби загружалось фиксированным числом запросов.
+        Сужаются до полей fields
+        """
+        return fields.loader_options(Lobby, {
+            "members": selectinload,
+            "author": joinedload,
+            "game": joinedload,
+        })
 
     @staticmethod
+    def list_options(fields: FieldSet = ALL_FIELDS):
+        """
+        Тоже что read_options, но games уже присоединена через join
+        для фильтрации, поэтому берем ее из того же запроса
+        """
+        return fields.loader_options(Lobby, {
+            "members": selectinload,
+            "author": joinedload,
+            "game": contains_eager,
+        })
+
+    @staticmethod
+    def get(id: int, fields: FieldSet = ALL_FIELDS):
+        return db.session.get(
+            Lobby, id,
+            options=LobbyService.read_options(fields),
+            populate_existing=True
+        )
+
+    @staticmethod
+    def exists(id: int) -> bool:
+        return db.session.query(exists().where(Lobby.id == id)).scalar()
+
+    @staticmethod
+    @read_only
     def get_list(
             platform=None,
             min_skill=None,
             max_skill=None,
             open_slots=None,
             search_game=None,
+            page: PageParams = None,
+            options=None,
+            fields: FieldSet = ALL_FIELDS,
     ):
-        query = db.session.query(Lobby).join(Game)
+        """
+        options заменяет стратегии загрузки связей list_options, когда
+        вызывающий загружает связи сам (например пачкой на несколько списков)
+        """
+        if options is None:
+            options = LobbyService.list_options(fields)
+
+        query = (
+            db.session.query(Lobby)
+            .join(Game)
+            .options(*options)
+        )
 
         if min_skill:
             query = query.filter(Lobby.skill_level >= min_skill)
         if max_skill:
             query = query.filter(Lobby.skill_level <= max_skill)
 
-        if search_game:
-            query = query.filter(Game.name.like(f'%{search_game}%'))
+        search = SubstringSearch().add(Game.name, search_game)
+        query = search.apply(query)
         if open_slots:
             query = query.filter(Lobby.filled_slots < Lobby.slots)
         if platform:
             query = query.filter(Lobby.platform == platform)
 
-        return query.all()
+        return paginate(query, search.sort_keys(Lobby.id), page)
 
     @staticmethod
-    def get_authors_list(user: User):
-        return db.session.query(Lobby).filter(Lobby.author_id == user.id)
+    def get_authors_list(user: User, page: PageParams = None, options=None,
+                         fields: FieldSet = ALL_FIELDS):
+        if options is None:
+            options = LobbyService.read_options(fields)
+
+        query = (
+            db.session.query(Lobby)
+            .filter(Lobby.author_id == user.id)
+            .options(*options)
+        )
+        return paginate(query, [Lobby.id], page)
 
 
+    @staticmethod
+    def normalize(page: Page) -> LobbyListNormalizedSchema:
+        """
+        Нормализованная страница лобби загруженных без связей (options=()):
+        id участников одним запросом, все различные пользователи и игры
+        страницы по одному разу в included
+        """
+        lobby_ids = [lobby.id for lobby in page.items]
+        member_ids = {lobby_id: [] for lobby_id in lobby_ids}
+        if lobby_ids:
+            for lobby_id, user_id in db.session.execute(
+                select(lobby_users.c.lobby_id, lobby_users.c.user_id)
+                .where(lobby_users.c.lobby_id.in_(lobby_ids))
+                .order_by(lobby_users.c.lobby_id, lobby_users.c.user_id)
+            ):
+                member_ids[lobby_id].append(user_id)
+
+        user_ids = {lobby.author_id for lobby in page.items
+                    if lobby.author_id is not None}
+        for ids in member_ids.values():
+            user_ids.update(ids)
+
+        return LobbyListNormalizedSchema.model_validate({
+            "lobbies": [
+                ref_row(lobby, LobbyRefSchema, member_ids=member_ids[lobby.id])
+                for lobby in page.items
+            ],
+            "included": build_included(
+                user_ids, {lobby.game_id for lobby in page.items}
+            ),
+            "next_cursor": page.next_cursor,
+        })
+
+    @staticmethod
+    def _publish(event_type, lobby, **extra):
+        """
+        Событие изменения лобби для SSE потоков, публикуется после коммита.
+        Поля game_id, platform и skill_level нужны фильтрам доски лобби
+        """
+        data = {
+            "lobby_id": lobby.id,
+            "game_id": lobby.game_id,
+            "platform": lobby.platform,
+            "skill_level": lobby.skill_level,
+            "slots": lobby.slots,
+            "filled_slots": lobby.filled_slots,
+        }
+        data.update(extra)
+        event_streams.publish("lobbies", event_type, data)
+
     @staticmethod
     def create(user: User, lobby_obj: LobbyWriteSchema):
         kwargs = lobby_obj.model_dump()
-        game_id = kwargs.pop("game_id")
-        game = GameService.get_by_id(game_id)
-        if game is None:
+        if not GameService.exists(lobby_obj.game_id):
             raise NotFound("Game not found")
 
         lobby = Lobby(
-            game=game,
             author=user,
             members=[user],
             filled_slots=1,
@@ -59,42 +173,173 @@ class LobbyService:
         )
 
         db.session.add(lobby)
+        bump_versions("lobbies")
         db.session.commit()
+        LobbyService._publish("lobby_created", lobby, author_id=user.id)
         return lobby
 
+    @staticmethod
+    def _membership(lobby_id, user_id):
+        return exists().where(
+            lobby_users.c.lobby_id == lobby_id,
+            lobby_users.c.user_id == user_id,
+        )
+
     @staticmethod
     def join(user: User, lobby_id):
-        lobby = LobbyService.get(lobby_id)
-        if lobby is None:
+        """
+        Вступление одним условным UPDATE: счетчик увеличивается только если
+        есть свободное место и пользователь еще не участник, блокировка
+        строки лобби сериализует конкурентные вступления. Повторное
+        вступление того же пользователя в гонке отсекает уникальный ключ
+        (lobby_id, user_id)
+        """
+        user_id = user.id
+        is_member = LobbyService._membership(lobby_id, user_id)
+
+        taken = db.session.execute(
+            update(Lobby)
+            .where(
+                Lobby.id == lobby_id,
+                Lobby.filled_slots < Lobby.slots,
+                ~is_member,
+            )
+            .values(filled_slots=Lobby.filled_slots + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        if taken:
+            try:
+                db.session.execute(
+                    insert(lobby_users).values(lobby_id=lobby_id,
+                                               user_id=user_id)
+                )
+                bump_versions("lobbies")
+                db.session.commit()
+            except IntegrityError:
+                # Параллельный запрос того же пользователя уже вступил
+                db.session.rollback()
+                return LobbyService.get(lobby_id)
+
+            lobby = LobbyService.get(lobby_id)
+            LobbyService._publish("member_joined", lobby, user_id=user_id)
+            return lobby
+
+        state = db.session.execute(
+            select(Lobby.id, is_member.label("is_member"))
+            .where(Lobby.id == lobby_id)
+        ).first()
+        db.session.rollback()
+
+        if state is None:
             return None
+        if not state.is_member:
+            raise Conflict("Lobby is full")
 
-        if user not in lobby.members:
-            lobby.members.append(user)
-            lobby.filled_slots += 1
+        return LobbyService.get(lobby_id)
 
-        db.session.commit()
-        return lobby
+    @staticmethod
+    def _quick_join_candidate(user_id, params: LobbyQuickJoinSchema):
+        return (
+            select(Lobby.id)
+            .where(
+                Lobby.game_id == params.game_id,
+                Lobby.platform == params.platform,
+                Lobby.skill_level.between(params.min_skill, params.max_skill),
+                Lobby.filled_slots < Lobby.slots,
+                ~LobbyService._membership(Lobby.id, user_id),
+            )
+            .order_by(
+                (Lobby.slots - Lobby.filled_slots).asc(),
+                Lobby.start_time.asc(),
+                Lobby.id.asc(),
+            )
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+
+    @staticmethod
+    def quick_join(user: User, params: LobbyQuickJoinSchema, attempts=5):
+        """
+        Подбирает лучшее открытое лобби из корзины (game_id, platform,
+        skill_level) по частичному индексу ix_lobbies_open_bucket и
+        атомарно вступает в него. Предпочитаем почти заполненные и раньше
+        начинающиеся лобби, заблокированные другими подборами пропускаются
+        (SKIP LOCKED), а если лобби успели заполнить, берем следующее
+        """
+        candidate_query = LobbyService._quick_join_candidate(user.id, params)
+
+        for _ in range(attempts):
+            lobby_id = db.session.execute(candidate_query).scalar()
+            if lobby_id is None:
+                db.session.rollback()
+                break
+
+            try:
+                lobby = LobbyService.join(user, lobby_id)
+            except Conflict:
+                continue
+
+            if lobby is not None:
+                return lobby
+
+        raise NotFound("No open lobby matches")
 
     @staticmethod
     def leave(user: User, lobby_id):
-        lobby = LobbyService.get(lobby_id)
+        """
+        Выход удаляет строку участия и уменьшает счетчик только если она
+        действительно была удалена, поэтому повторный выход ничего не меняет
+        """
+        user_id = user.id
+        lobby = db.session.execute(
+            select(
+                Lobby.id, Lobby.author_id, Lobby.game_id, Lobby.platform,
+                Lobby.skill_level, Lobby.slots, Lobby.filled_slots,
+            )
+            .where(Lobby.id == lobby_id)
+            .with_for_update()
+        ).first()
+
         if lobby is None:
+            db.session.rollback()
             return None
 
-        if user in lobby.members:
-            lobby.members.remove(user)
+        if lobby.author_id == user_id:
+            return LobbyService.delete(lobby_id)
 
-            lobby.filled_slots -= 1
-        if user == lobby.author:
-            db.session.delete(lobby)
+        left = db.session.execute(
+            delete(lobby_users).where(
+                lobby_users.c.lobby_id == lobby_id,
+                lobby_users.c.user_id == user_id,
+            )
+        ).rowcount
 
+        if not left:
+            db.session.rollback()
+            return True
+
+        filled_slots = db.session.execute(
+            update(Lobby)
+            .where(Lobby.id == lobby_id)
+            .values(filled_slots=Lobby.filled_slots - 1)
+            .returning(Lobby.filled_slots)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+        bump_versions("lobbies")
         db.session.commit()
-        return lobby
+
+        LobbyService._publish(
+            "member_left", lobby, filled_slots=filled_slots, user_id=user_id
+        )
+        return True
 
     @staticmethod
     def delete(lobby_id):
         lobby = LobbyService.get(lobby_id)
         if lobby is not None:
             db.session.delete(lobby)
+            bump_versions("lobbies")
             db.session.commit()
+            LobbyService._publish("lobby_deleted", lobby)
         return True
@@ -1,12 +1,17 @@
 from flask import Blueprint, request
 from werkzeug.exceptions import NotFound, Forbidden
 
+from core.exception_catcher import exception_catcher
+from core.fieldsets import FieldSet
+from core.normalization import normalized_requested
+from core.pagination import PageParams
 from core.rest_api_extension import rest_api
 from lobbies.models import Lobby
 from lobbies.schemas import LobbyWriteSchema, LobbyReadSchema, LobbyListSchema, \
-    NonResponseSchema
+    NonResponseSchema, LobbyQuickJoinSchema, LobbyListNormalizedSchema
 from lobbies.services import LobbyService
 from users.models import User
+from extensions import event_streams
 
 lobbies_bp = Blueprint("lobbies", __name__, url_prefix="/api/lobbies")
 
@@ -24,55 +29,122 @@ def create_lobby(user: User, lobby_obj: LobbyWriteSchema):
 @lobbies_bp.route("/<int:lobby_id>", methods=["GET"])
 @rest_api(
     description="Получение лобби по id",
-    responses=[{200: LobbyReadSchema}]
+    responses=[{200: LobbyReadSchema}],
+    etag_resources=["lobbies", "games", "users"],
 )
-def get_lobby(lobby_id: int):
-    lobby = LobbyService.get(lobby_id)
+def get_lobby(lobby_id: int, fields: FieldSet):
+    lobby = LobbyService.get(lobby_id, fields)
     if lobby is None:
         raise NotFound("Lobby not found")
-    return LobbyReadSchema.model_validate(lobby, from_attributes=True)
+    return fields.schema(LobbyReadSchema).model_validate(
+        lobby, from_attributes=True
+    )
 
 
 @lobbies_bp.route("", methods=["GET"])
 @rest_api(
-    description="Получение списка лобби с фильтрацией",
-    responses=[{200: LobbyListSchema}],
+    description="Получение списка лобби с фильтрацией. С normalized=true"
+                " ответ имеет форму LobbyListNormalizedSchema: лобби содержат"
+                " id связей, а пользователи и игры по одному разу в included",
+    responses=[{200: LobbyListSchema}, {200: LobbyListNormalizedSchema}],
     query_params=[
         "platform",
         "search_game",
         "min_skill",
         "max_skill",
         "open_slots",
-    ]
+        "normalized",
+    ],
+    etag_resources=["lobbies", "games", "users"],
 )
-def get_list_lobby():
+def get_list_lobby(page: PageParams, fields: FieldSet):
     query = request.args
     min_skill = query.get("min_skill")
     max_skill = query.get("max_skill")
+    normalized = normalized_requested(fields)
     lobbies = LobbyService.get_list(
         platform=query.get('platform'),
         min_skill=int(min_skill) if min_skill else None,
         max_skill=int(max_skill) if max_skill else None,
         search_game=query.get("search_game"),
         open_slots=query.get("open_slots") == "true",
+        page=page,
+        options=() if normalized else None,
+        fields=fields,
     )
+    if normalized:
+        return LobbyService.normalize(lobbies)
 
-    return LobbyListSchema(
-        lobbies=[LobbyReadSchema.model_validate(lobby, from_attributes=True)
-                 for lobby in lobbies])
+    return fields.schema(LobbyListSchema).model_validate(
+        {"lobbies": lobbies.items, "next_cursor": lobbies.next_cursor},
+        from_attributes=True,
+    )
 
 
 @lobbies_bp.route("/my", methods=["GET"])
 @rest_api(
     description="Получение списка лобби у которых"
-                " данный пользователь является автором",
-    responses=[{200: LobbyListSchema}],
+                " данный пользователь является автором,"
+                " normalized=true как у списка лобби",
+    responses=[{200: LobbyListSchema}, {200: LobbyListNormalizedSchema}],
+    query_params=["normalized"],
+    etag_resources=["lobbies", "games", "users"],
 )
-def get_my_list_lobby(user: User):
-    lobbies = LobbyService.get_authors_list(user)
-    return LobbyListSchema(
-        lobbies=[LobbyReadSchema.model_validate(lobby, from_attributes=True)
-                 for lobby in lobbies])
+def get_my_list_lobby(user: User, page: PageParams, fields: FieldSet):
+    normalized = normalized_requested(fields)
+    lobbies = LobbyService.get_authors_list(
+        user, page, options=() if normalized else None, fields=fields
+    )
+    if normalized:
+        return LobbyService.normalize(lobbies)
+
+    return fields.schema(LobbyListSchema).model_validate(
+        {"lobbies": lobbies.items, "next_cursor": lobbies.next_cursor},
+        from_attributes=True,
+    )
+
+
+@lobbies_bp.route("/events", methods=["GET"])
+@exception_catcher
+def lobby_board_events():
+    """
+    SSE поток изменений всех лобби для доски, фильтры как у списка лобби:
+    game_id, platform, min_skill, max_skill
+    """
+    query = request.args
+    game_id = query.get("game_id", type=int)
+    platform = query.get("platform")
+    min_skill = query.get("min_skill", type=int)
+    max_skill = query.get("max_skill", type=int)
+
+    def matches(event):
+        skill = event["skill_level"] or 0
+        return (
+            (game_id is None or event["game_id"] == game_id)
+            and (platform is None or event["platform"] == platform)
+            and (min_skill is None or skill >= min_skill)
+            and (max_skill is None or skill <= max_skill)
+        )
+
+    subscription = event_streams.subscribe("lobbies", matches)
+    return event_streams.response(subscription)
+
+
+@lobbies_bp.route("/<int:lobby_id>/events", methods=["GET"])
+@exception_catcher
+def lobby_events(lobby_id: int):
+    """
+    SSE поток изменений одного лобби: вступления, выходы и удаление
+    """
+    if not LobbyService.exists(lobby_id):
+        raise NotFound("Lobby not found")
+
+    subscription = event_streams.subscribe(
+        "lobbies", lambda event: event["lobby_id"] == lobby_id
+    )
+    return event_streams.response(
+        subscription, stop_event_types=("lobby_deleted",)
+    )
 
 
 @lobbies_bp.route("/<int:lobby_id>/join", methods=["PATCH"])
@@ -89,6 +161,17 @@ def join_lobby(user: User, lobby_id):
     return LobbyReadSchema.model_validate(lobby, from_attributes=True)
 
 
+@lobbies_bp.route("/quick-join", methods=["POST"])
+@rest_api(
+    description="Быстрый подбор: вступление в лучшее открытое лобби"
+                " по игре, платформе и диапазону навыка",
+    responses=[{200: LobbyReadSchema}, {404: NonResponseSchema}]
+)
+def quick_join_lobby(user: User, params: LobbyQuickJoinSchema):
+    lobby = LobbyService.quick_join(user, params)
+    return LobbyReadSchema.model_validate(lobby, from_attributes=True)
+
+
 @lobbies_bp.route("/<int:lobby_id>/leave", methods=["DELETE"])
 @rest_api(
     description="Выход из лобби, идемпотентен (если пользователя"
@@ -1,6 +1,6 @@
 from enum import Enum
 
-from app import db
+from extensions import db
 
 
 class UserGenderEnum(Enum):
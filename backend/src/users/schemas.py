@@ -42,6 +42,7 @@ class UserReadSchema(UserBaseSchema):
 
 class UsersListSchema(BaseModel):
     users: list[UserReadSchema]
+    next_cursor: Optional[str] = None
 
 
 class TokenSchema(UserReadSchema):
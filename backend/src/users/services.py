@@ -1,30 +1,75 @@
 from sqlalchemy.exc import IntegrityError
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.exceptions import Conflict
 
-from app import db
+from extensions import db, password_hasher
+from core.conditional_get import bump_versions
+from core.fieldsets import ALL_FIELDS, FieldSet
+from core.pagination import paginate, PageParams
+from core.projection import Projection
+from core.replicas import read_only
 from users.models import User
+from users.schemas import UserReadSchema
 
 class UserService:
+    # Проекция без пароля и связей под схему списка пользователей
+    read_projection = Projection(UserReadSchema, User)
+
+    @staticmethod
+    @read_only
+    def get_all(page: PageParams = None):
+        return paginate(
+            db.session.query(User), [User.username, User.id], page
+        )
+
     @staticmethod
-    def get_all():
-        users = db.session.query(User).all()
+    @read_only
+    def get_all_rows(page: PageParams = None, fields: FieldSet = ALL_FIELDS):
+        """
+        Тоже что get_all, но строками-словарями формы UserReadSchema
+        с полями fields
+        """
+        projection = UserService.read_projection.only(fields.names)
+        users = paginate(projection.select(), [User.username, User.id], page)
+        users.items = projection.rows(users.items)
         return users
 
     @staticmethod
-    def get(id):
-        user = db.session.query(User).get(id)
+    def get_rows_by_ids(ids) -> list[dict]:
+        """
+        Пользователи формы UserReadSchema по множеству id одним запросом
+        """
+        if not ids:
+            return []
+        projection = UserService.read_projection
+        rows = db.session.execute(
+            projection.select().where(User.id.in_(ids)).order_by(User.id)
+        ).all()
+        return projection.rows(rows)
+
+    @staticmethod
+    def get(id, fields: FieldSet = ALL_FIELDS):
+        user = db.session.get(User, id, options=fields.loader_options(User, {}))
         return user
 
     @staticmethod
     def create(user_creds):
+        # Проверяем уникальность до дорогого хеширования, IntegrityError
+        # остается на случай гонки двух одновременных регистраций
+        username_taken = db.session.query(User.id).filter_by(
+            username=user_creds.username
+        ).first()
+        if username_taken:
+            raise Conflict("User with this username already exists")
+
         try:
-            hashed_pass = generate_password_hash(user_creds.password, method="pbkdf2:sha256")
+            hashed_pass = password_hasher.hash(user_creds.password)
             delattr(user_creds, "password")
             user = User(password=hashed_pass, **user_creds.model_dump(mode="json"))
             db.session.add(user)
+            bump_versions("users")
             db.session.commit()
         except IntegrityError as e:
+            db.session.rollback()
             raise Conflict("User with this username already exists")
         return user
 
@@ -34,7 +79,11 @@ class UserService:
         if not user:
             return None
 
-        if check_password_hash(user.password, password):
-            return user
+        if not password_hasher.verify(user.password, password):
+            return None
+
+        if password_hasher.needs_rehash(user.password):
+            user.password = password_hasher.hash(password)
+            db.session.commit()
 
-        return None
\ No newline at end of file
+        return user
\ No newline at end of file
@@ -2,7 +2,11 @@ from flask_jwt_extended import (create_access_token)
 from flask import Blueprint
 from werkzeug.exceptions import Unauthorized, NotFound
 
+from core.fieldsets import FieldSet
+from core.pagination import PageParams
+from core.rate_limit import RateLimit
 from core.rest_api_extension import rest_api
+from extensions import replica_routing
 from users.models import User
 from users.schemas import UserSchemaLogin, TokenSchema, \
     UserSchemaSignUp, UserReadSchema, UsersListSchema, \
@@ -15,10 +19,12 @@ users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 @users_bp.route("/signup", methods=["POST"])
 @rest_api(
     description="Регистрирует пользователя и возвращает токен c самим пользователем",
-    responses=[{201: TokenSchema}]
+    responses=[{201: TokenSchema}],
+    rate_limit=RateLimit(limit=5, period=60, key="ip"),
 )
 def signup(user_creds: UserSchemaSignUp):
     user = UserService.create(user_creds)
+    replica_routing.bind_identity(str(user.id))
     access_token = create_access_token(identity=str(user.id), expires_delta=False)
     user.token = access_token
     return TokenSchema.model_validate(user, from_attributes=True), 201
@@ -28,7 +34,8 @@ def signup(user_creds: UserSchemaSignUp):
 @rest_api(
     description="Создает токен авторизации на основе пароля "
                 "и юзернейма и возвращает его вместе с пользомателем",
-    responses=[{200: TokenSchema}]
+    responses=[{200: TokenSchema}],
+    rate_limit=RateLimit(limit=10, period=60, key="ip"),
 )
 def login(user_creds: UserSchemaLogin):
     user = UserService.get_by_pass_username(user_creds.password,
@@ -44,32 +51,36 @@ def login(user_creds: UserSchemaLogin):
 @users_bp.route("/protected", methods=["POST"])
 @rest_api(description="Эндпоинт требующий токен в заголовке",
           responses=[{200: UserReadSchema}])
-def protected_endpoint(user: User):
-    return UserReadSchema.model_validate(user, from_attributes=True), 200
+def protected_endpoint(user: User, fields: FieldSet):
+    return fields.schema(UserReadSchema).model_validate(
+        user, from_attributes=True
+    ), 200
 
 
 @users_bp.route("/<int:user_id>", methods=["GET"])
 @rest_api(
     description="Получение пользователя по id",
-    responses=[{200: UserReadSchema}, {404: UserNotFoundSchema}]
+    responses=[{200: UserReadSchema}, {404: UserNotFoundSchema}],
+    etag_resources=["users"],
 )
-def get_user(user_id: int):
-    user = UserService.get(user_id)
+def get_user(user_id: int, fields: FieldSet):
+    user = UserService.get(user_id, fields)
     if user is None:
         raise NotFound("User not found")
 
-    return UserReadSchema.model_validate(user, from_attributes=True)
+    return fields.schema(UserReadSchema).model_validate(
+        user, from_attributes=True
+    )
 
 
 @users_bp.route("/", methods=["GET"])
 @rest_api(
-    description="Получение всех пользователей", responses=[{200: UsersListSchema}]
+    description="Получение всех пользователей", responses=[{200: UsersListSchema}],
+    etag_resources=["users"],
 )
-def get_users_list():
-    users = UserService.get_all()
-    return UsersListSchema(
-        users=[UserReadSchema.model_validate(user, from_attributes=True) for
-               user in users])
+def get_users_list(page: PageParams, fields: FieldSet):
+    users = UserService.get_all_rows(page, fields)
+    return {"users": users.items, "next_cursor": users.next_cursor}
 
 
 @users_bp.route("/profile", methods=["GET"])
@@ -77,7 +88,9 @@ def get_users_list():
     description="Получение текущего авторизованного пользователя (из токена)",
     responses=[{200: UserReadSchema}]
 )
-def get_profile_user(authed_user: User):
-    user = UserService.get(authed_user.id)
+def get_profile_user(authed_user: User, fields: FieldSet):
+    user = UserService.get(authed_user.id, fields)
 
-    return UserReadSchema.model_validate(user, from_attributes=True)
+    return fields.schema(UserReadSchema).model_validate(
+        user, from_attributes=True
+    )
@@ -1,3 +1,5 @@
-from app import create_app
+from app import create_app, warm_up
 
-app = create_app()
\ No newline at end of file
+app = create_app()
+# Под gunicorn с preload выполняется в мастере до fork воркеров
+warm_up(app)